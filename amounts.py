@@ -0,0 +1,96 @@
+import re
+import unicodedata
+from typing import Optional
+
+CHINESE_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+CHINESE_UNITS = {"十": 10, "百": 100, "千": 1000}
+NUMBER_MULTIPLIERS = {"万": 10000, "w": 10000, "千": 1000, "k": 1000}
+LOWER_MULTIPLIERS = {"千": 1000, "k": 1000, "百": 100}
+
+CHINESE_NUMBER_PATTERN = re.compile(r"[零〇一二两三四五六七八九十百千万]+")
+GROUPED_NUMBER_PATTERN = re.compile(r"(?<![\d,.])\d{1,3}(?:,\d{3})+(?!\d)")
+COMPOUND_NUMBER_PATTERN = re.compile(r"(?<![\d.])(\d+)\s*(万|w|千|k)\s*(\d+)(?:\s*(千|k|百))?(?![\d.a-z])")
+SCALED_NUMBER_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(万|w|千|k)(?![a-z])")
+AMOUNT_PATTERN = re.compile(r"(?<![\d.])(-?\d+(?:\.\d+)?)(?:\s*(万|w|千|k)(?![a-z]))?")
+
+
+def chinese_to_int(text: str) -> Optional[int]:
+    total = 0
+    section = 0
+    digit = None
+    last_unit = None
+    for char in text:
+        if char in CHINESE_DIGITS:
+            digit = CHINESE_DIGITS[char]
+            if digit == 0:
+                last_unit = None
+        elif char in CHINESE_UNITS:
+            section += (1 if digit is None else digit) * CHINESE_UNITS[char]
+            digit = None
+            last_unit = CHINESE_UNITS[char]
+        elif char == "万":
+            section += digit or 0
+            total += (section or 1) * 10000
+            section = 0
+            digit = None
+            last_unit = 10000
+        else:
+            return None
+    # 一千五 / 两万五: a trailing digit right after a unit counts in the next lower unit.
+    if digit and last_unit:
+        digit *= last_unit // 10
+    return total + section + (digit or 0)
+
+
+def _replace_chinese_number(match) -> str:
+    text = match.group()
+    if text in ("千", "万"):
+        return text
+    value = chinese_to_int(text)
+    return text if value is None else str(value)
+
+
+def replace_chinese_numbers(text: str) -> str:
+    return CHINESE_NUMBER_PATTERN.sub(_replace_chinese_number, text)
+
+
+def format_number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.6f}".rstrip("0").rstrip(".")
+
+
+def ungroup_numbers(text: str) -> str:
+    return GROUPED_NUMBER_PATTERN.sub(lambda m: m.group().replace(",", ""), text)
+
+
+def _replace_compound_number(match) -> str:
+    high, unit, low, lower_unit = match.groups()
+    scale = NUMBER_MULTIPLIERS[unit]
+    if lower_unit:
+        low_value = int(low) * LOWER_MULTIPLIERS[lower_unit]
+    elif len(low) == 1:
+        # 1万3 / 2千5: a bare digit after the unit counts in the next lower unit.
+        low_value = int(low) * scale // 10
+    else:
+        low_value = int(low)
+    if low_value >= scale:
+        return match.group()
+    return str(int(high) * scale + low_value)
+
+
+def scale_numbers(text: str) -> str:
+    text = COMPOUND_NUMBER_PATTERN.sub(_replace_compound_number, text)
+    return SCALED_NUMBER_PATTERN.sub(lambda m: format_number(float(m.group(1)) * NUMBER_MULTIPLIERS[m.group(2)]), text)
+
+
+def parse_amount(text: str) -> Optional[float]:
+    text = unicodedata.normalize("NFKC", text).lower()
+    if not re.search(r"\d", text):
+        text = replace_chinese_numbers(text)
+    amounts = list(AMOUNT_PATTERN.finditer(scale_numbers(ungroup_numbers(text))))
+    # Ranges such as 5000-8000 or strings with several figures have no single value.
+    if len(amounts) != 1:
+        return None
+    number, unit = amounts[0].groups()
+    return float(number) * NUMBER_MULTIPLIERS.get(unit, 1)
@@ -1,345 +1,505 @@
 import streamlit as st
-from audiorecorder import audiorecorder
-import pandas as pd
 import json
 import os
-import io
-import tempfile
+import hashlib
 from dotenv import load_dotenv
-from openai import OpenAI
-from aip import AipSpeech
-from pydub import AudioSegment
-from database import init_db, register_user, authenticate_user, save_itinerary, get_user_itineraries, get_latest_itinerary, get_total_budget, add_expense, get_user_expenses, delete_expense, delete_itinerary
-
-load_dotenv()
-
-init_db()
-
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
-if "username" not in st.session_state:
-    st.session_state.username = None
-if "user_id" not in st.session_state:
-    st.session_state.user_id = None
-if "api_key" not in st.session_state:
-    st.session_state.api_key = os.getenv("API_KEY", "")
-if "api_base_url" not in st.session_state:
-    st.session_state.api_base_url = os.getenv("API_BASE_URL", "")
-if "current_itinerary_id" not in st.session_state:
-    st.session_state.current_itinerary_id = None
-
-
-def speech_to_text(audio_data) -> str:
-    try:
-        baidu_app_id = os.getenv("BAIDU_APP_ID", "")
-        baidu_api_key = os.getenv("BAIDU_API_KEY", "")
-        baidu_secret_key = os.getenv("BAIDU_SECRET_KEY", "")
-        
+
+
+@st.cache_resource(show_spinner=False)
+def load_settings() -> dict:
+    load_dotenv()
+    return {
+        "api_key": os.getenv("API_KEY", ""),
+        "api_base_url": os.getenv("API_BASE_URL", ""),
+        "baidu_credentials": (os.getenv("BAIDU_APP_ID", ""), os.getenv("BAIDU_API_KEY", ""), os.getenv("BAIDU_SECRET_KEY", "")),
+    }
+
+
+settings = load_settings()
+
+from metrics import ASR_ERRORS, BOOTSTRAP_SECONDS, start_metrics_exporters, timed_rerun
+
+with timed_rerun():
+    from database import init_db, register_user, authenticate_user, count_user_itineraries, get_itinerary_page, get_itinerary_result, get_itinerary_versions, get_total_budget, add_expense, get_expense_rows, get_itinerary_budgets, update_expenses, delete_expenses, delete_itinerary, get_read_cache_stats, get_generation_job, get_pending_generation_job, mark_generation_job_delivered, get_batch_jobs, get_latest_batch_id, ACTIVE_JOB_STATUSES
+    from llm_cache import get_cache_stats
+    from clients import evict_openai_client, evict_speech_client
+    from jobs import start_job_workers, submit_generation_job, submit_generation_batch, get_job_progress
+    from batch import BATCH_MAX_PROMPTS, BatchInputError, read_batch_csv
+
+
+    @st.cache_resource(show_spinner=False)
+    def bootstrap():
+        with BOOTSTRAP_SECONDS.time():
+            init_db()
+            start_job_workers()
+        start_metrics_exporters()
+
+
+    bootstrap()
+
+    USER_SESSION_DEFAULTS = {
+        "logged_in": False,
+        "username": None,
+        "user_id": None,
+        "current_itinerary_id": None,
+        "history_pages": 1,
+        "active_job_id": None,
+        "job_polling": False,
+        "pending_job_checked": False,
+        "active_batch_id": None,
+        "batch_polling": False,
+    }
+
+    if "session_initialized" not in st.session_state:
+        for key, value in {**settings, **USER_SESSION_DEFAULTS}.items():
+            st.session_state.setdefault(key, value)
+        st.session_state.session_initialized = True
+
+    HISTORY_PAGE_SIZE = 5
+    JOB_POLL_INTERVAL = 1.0
+    BATCH_POLL_INTERVAL = 2.0
+    JOB_STATUS_LABELS = {"queued": "排队中", "running": "生成中", "succeeded": "已完成", "failed": "失败"}
+
+
+    def speech_to_text(audio_data) -> str:
+        baidu_app_id, baidu_api_key, baidu_secret_key = st.session_state.baidu_credentials
         if not baidu_app_id or not baidu_api_key or not baidu_secret_key:
             st.warning("请先在侧边栏配置百度语音识别API")
             return ""
-        
-        client = AipSpeech(baidu_app_id, baidu_api_key, baidu_secret_key)
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_input:
-            temp_input.write(audio_data)
-            temp_input.flush()
-            temp_input_path = temp_input.name
-        
+
+        from speech import SpeechRecognitionError, recognize_speech
         try:
-            audio = AudioSegment.from_file(temp_input_path)
-            
-            audio = audio.set_frame_rate(16000)
-            audio = audio.set_channels(1)
-            
-            target_dBFS = -20.0
-            change_in_dBFS = target_dBFS - audio.dBFS
-            audio = audio.apply_gain(change_in_dBFS)
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_output:
-                temp_output_path = temp_output.name
-            
-            audio.export(temp_output_path, format="wav", parameters=["-ar", "16000", "-ac", "1"])
-            
-            with open(temp_output_path, 'rb') as f:
-                wav_data = f.read()
-            
-            os.unlink(temp_output_path)
-        finally:
-            os.unlink(temp_input_path)
-        
-        result = client.asr(wav_data, 'wav', 16000, {
-            'dev_pid': 1537,
-            'rate': 16000,
-            'cuid': 'travel_planning_user',
-        })
-        
-        if result['err_no'] == 0:
-            recognized_text = result['result'][0]
-            
-            if len(recognized_text) < 3:
-                st.warning("识别结果过短，请重新录制清晰的语音")
-                return ""
-            
-            return recognized_text
-        else:
-            st.error(f"语音识别失败: {result['err_msg']}")
+            recognized_text = recognize_speech(audio_data, baidu_app_id, baidu_api_key, baidu_secret_key)
+        except SpeechRecognitionError as e:
+            if e.reason == "silence":
+                st.warning(str(e))
+            else:
+                st.error(str(e))
             return ""
-    except Exception as e:
-        st.error(f"语音识别错误: {str(e)}")
-        return ""
-
-
-def call_llm(prompt: str) -> dict:
-    try:
-        client = OpenAI(
-            api_key=st.session_state.api_key,
-            base_url=st.session_state.api_base_url
-        )
-        
-        system_prompt = """你是一个专业的旅行规划助手。请根据用户的需求生成旅行计划。
-必须返回纯 JSON 格式，不要包含任何其他文字。
-JSON 格式如下：
-{
-    "itinerary_text": "详细的旅行计划文本，包括每天的行程安排、交通方式、住宿建议等，以及详细的费用预算分析",
-    "coordinates": [
-        {"name": "地点名称", "lat": 纬度, "lon": 经度}
-    ]
-}
-coordinates 数组包含行程中主要地点的经纬度坐标，用于在地图上展示。"""
-
-        response = client.chat.completions.create(
-            model="qwen-plus",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
-        content = content.strip()
-        
-        return json.loads(content)
-    except Exception as e:
-        st.error(f"调用 LLM 失败: {str(e)}")
-        return None
-
-
-st.set_page_config(page_title="旅行规划助手", layout="wide")
-
-with st.sidebar:
-    st.title("旅行规划助手")
-    
-    st.divider()
-    
-    if not st.session_state.logged_in:
-        st.subheader("用户登录")
-        auth_option = st.radio("", ["登录", "注册"])
-        
-        if auth_option == "登录":
-            username = st.text_input("用户名")
-            password = st.text_input("密码", type="password")
-            if st.button("登录"):
-                user = authenticate_user(username, password)
-                if user:
-                    st.session_state.logged_in = True
-                    st.session_state.username = username
-                    st.session_state.user_id = user.id
-                    st.success("登录成功！")
-                    st.rerun()
-                else:
-                    st.error("用户名或密码错误")
+        except Exception as e:
+            st.error(f"语音识别错误: {str(e)}")
+            return ""
+
+        if len(recognized_text) < 3:
+            ASR_ERRORS.inc("too_short")
+            st.warning("识别结果过短，请重新录制清晰的语音")
+            return ""
+
+        return recognized_text
+
+
+    def render_itinerary(itinerary_text, coordinates, final=True):
+        st.markdown(itinerary_text)
+        if not coordinates:
+            return
+
+        from geo import clean_coordinates, plan_route, map_points
+        if final:
+            route_df, day_distances = plan_route(coordinates)
+            points = map_points(route_df)
         else:
-            username = st.text_input("用户名")
-            password = st.text_input("密码", type="password")
-            if st.button("注册"):
-                if register_user(username, password):
-                    st.success("注册成功！请登录")
-                else:
-                    st.error("用户名已存在")
-    else:
-        st.success(f"欢迎, {st.session_state.username}!")
-        if st.button("退出登录"):
-            st.session_state.logged_in = False
-            st.session_state.username = None
-            st.session_state.user_id = None
-            st.session_state.current_itinerary_id = None
+            points = clean_coordinates(coordinates).assign(size=200)
+        if points.empty:
+            return
+
+        st.subheader("行程地图")
+        st.map(points, latitude="lat", longitude="lon", size="size", color="#0044ff")
+
+        if final:
+            st.subheader("路线安排")
+            route_table = route_df.assign(day=route_df["day"].astype("string").fillna("-"), leg_km=route_df["leg_km"].round(1))
+            st.dataframe(route_table[["order", "day", "name", "leg_km"]].rename(columns={"order": "顺序", "day": "第几天", "name": "地点", "leg_km": "距上一站（公里）"}), hide_index=True)
+            day_table = day_distances.assign(day=day_distances["day"].map(lambda day: f"第{day}天" if day else "未分天"), distance_km=day_distances["distance_km"].round(1))
+            st.dataframe(day_table.rename(columns={"day": "日期", "stops": "地点数", "distance_km": "当日路程（公里）"}), hide_index=True)
+            st.caption(f"全程约 {day_distances['distance_km'].sum():.1f} 公里")
+
+
+    def render_generation_job():
+        job = get_generation_job(st.session_state.active_job_id)
+        if job is None:
+            st.session_state.active_job_id = None
+            return
+
+        st.subheader("旅行计划")
+        if job.status in ACTIVE_JOB_STATUSES:
+            progress = get_job_progress(job.id)
+            if progress and progress[0]:
+                render_itinerary(*progress, final=False)
+            else:
+                st.info("正在排队，请稍候..." if job.status == "queued" else "正在生成旅行计划...")
+            return
+
+        if not job.delivered:
+            mark_generation_job_delivered(job.id)
+            if job.itinerary_id:
+                st.session_state.current_itinerary_id = job.itinerary_id
+        if st.session_state.job_polling:
+            st.session_state.job_polling = False
+            st.rerun()
+
+        if job.status == "failed":
+            st.error(f"调用 LLM 失败: {job.error}")
+            return
+
+        result = json.loads(job.result)
+        render_itinerary(result.get("itinerary_text", ""), result.get("coordinates", []))
+        if job.itinerary_id:
+            st.success("行程已保存！")
+
+
+    def render_generation_batch():
+        jobs = get_batch_jobs(st.session_state.active_batch_id)
+        if not jobs:
+            st.session_state.active_batch_id = None
+            return
+
+        finished = sum(1 for job in jobs if job[2] not in ACTIVE_JOB_STATUSES)
+        failed = sum(1 for job in jobs if job[2] == "failed")
+        st.subheader("批量生成进度")
+        st.progress(finished / len(jobs), text=f"已完成 {finished}/{len(jobs)}，失败 {failed}")
+        st.dataframe({
+            "需求": [job[1] for job in jobs],
+            "状态": [JOB_STATUS_LABELS.get(job[2], job[2]) for job in jobs],
+            "行程": [f"#{job[3]}" if job[3] else "" for job in jobs],
+            "错误": [job[4] or "" for job in jobs],
+        }, hide_index=True)
+
+        if finished == len(jobs) and st.session_state.batch_polling:
+            st.session_state.batch_polling = False
             st.rerun()
-    
-    st.divider()
-    
-    st.subheader("AI 设置")
-    api_key = st.text_input("API Key", value=st.session_state.api_key, type="password")
-    api_base_url = st.text_input("API Base URL", value=st.session_state.api_base_url)
-    
-    if st.button("保存设置"):
-        st.session_state.api_key = api_key
-        st.session_state.api_base_url = api_base_url
-        st.success("设置已保存")
-    
-    st.divider()
-    
-    st.subheader("百度语音识别设置")
-    baidu_app_id = st.text_input("百度 App ID", value=os.getenv("BAIDU_APP_ID", ""), type="password")
-    baidu_api_key = st.text_input("百度 API Key", value=os.getenv("BAIDU_API_KEY", ""), type="password")
-    baidu_secret_key = st.text_input("百度 Secret Key", value=os.getenv("BAIDU_SECRET_KEY", ""), type="password")
-    
-    if st.button("保存百度设置"):
-        os.environ["BAIDU_APP_ID"] = baidu_app_id
-        os.environ["BAIDU_API_KEY"] = baidu_api_key
-        os.environ["BAIDU_SECRET_KEY"] = baidu_secret_key
-        st.success("百度设置已保存")
-
-
-if not st.session_state.logged_in:
-    st.info("请在侧边栏登录或注册以使用完整功能")
-else:
-    st.title("旅行规划助手")
-    
-    tab1, tab2 = st.tabs(["行程生成", "记账"])
-    
-    with tab1:
-        st.header("生成旅行计划")
-        
-        st.subheader("输入方式")
-        input_method = st.radio("选择输入方式", ["文本输入", "语音录制"])
-        
-        user_input = ""
-        
-        if input_method == "文本输入":
-            user_input = st.text_area("请输入您的旅行需求", placeholder="例如：去日本5天，预算1万", height=100)
+
+
+    st.set_page_config(page_title="旅行规划助手", layout="wide")
+
+    with st.sidebar:
+        st.title("旅行规划助手")
+
+        st.divider()
+
+        if not st.session_state.logged_in:
+            st.subheader("用户登录")
+            auth_option = st.radio("", ["登录", "注册"])
+
+            if auth_option == "登录":
+                username = st.text_input("用户名")
+                password = st.text_input("密码", type="password")
+                if st.button("登录"):
+                    user = authenticate_user(username, password)
+                    if user:
+                        st.session_state.logged_in = True
+                        st.session_state.username = username
+                        st.session_state.user_id = user.id
+                        st.success("登录成功！")
+                        st.rerun()
+                    else:
+                        st.error("用户名或密码错误")
+            else:
+                username = st.text_input("用户名")
+                password = st.text_input("密码", type="password")
+                if st.button("注册"):
+                    if register_user(username, password):
+                        st.success("注册成功！请登录")
+                    else:
+                        st.error("用户名已存在")
         else:
-            st.info("💡 录音提示：\n- 请在安静环境下录音\n- 靠近麦克风，说话清晰\n- 录音时长建议3-10秒\n- 避免使用填充词（如'嗯'、'啊'）")
-            st.write("点击下方按钮开始录制语音")
-            audio = audiorecorder("点击录制", "点击停止")
-            
-            if len(audio) > 0:
-                st.audio(audio.export().read())
-                st.success("语音录制完成！")
-                
-                with st.spinner("正在识别语音..."):
-                    audio_data = audio.export().read()
-                    recognized_text = speech_to_text(audio_data)
-                    
+            st.success(f"欢迎, {st.session_state.username}!")
+            if st.button("退出登录"):
+                st.session_state.update(USER_SESSION_DEFAULTS)
+                st.rerun()
+
+        st.divider()
+
+        st.subheader("AI 设置")
+        api_key = st.text_input("API Key", value=st.session_state.api_key, type="password")
+        api_base_url = st.text_input("API Base URL", value=st.session_state.api_base_url)
+
+        if st.button("保存设置"):
+            if (api_key, api_base_url) != (st.session_state.api_key, st.session_state.api_base_url):
+                evict_openai_client(st.session_state.api_key, st.session_state.api_base_url)
+            st.session_state.api_key = api_key
+            st.session_state.api_base_url = api_base_url
+            st.success("设置已保存")
+
+        cache_stats = get_cache_stats()
+        st.caption(f"行程缓存：命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次")
+        read_cache_stats = get_read_cache_stats()
+        st.caption(f"数据缓存命中率：{read_cache_stats['hit_rate']:.0%}")
+
+        st.divider()
+
+        st.subheader("百度语音识别设置")
+        saved_app_id, saved_api_key, saved_secret_key = st.session_state.baidu_credentials
+        baidu_app_id = st.text_input("百度 App ID", value=saved_app_id, type="password")
+        baidu_api_key = st.text_input("百度 API Key", value=saved_api_key, type="password")
+        baidu_secret_key = st.text_input("百度 Secret Key", value=saved_secret_key, type="password")
+
+        if st.button("保存百度设置"):
+            if st.session_state.baidu_credentials != (baidu_app_id, baidu_api_key, baidu_secret_key):
+                evict_speech_client(*st.session_state.baidu_credentials)
+            st.session_state.baidu_credentials = (baidu_app_id, baidu_api_key, baidu_secret_key)
+            st.session_state.pop("recording_key", None)
+            st.success("百度设置已保存")
+
+
+    if not st.session_state.logged_in:
+        st.info("请在侧边栏登录或注册以使用完整功能")
+    else:
+        st.title("旅行规划助手")
+
+        tab1, tab2 = st.tabs(["行程生成", "记账"])
+
+        with tab1:
+            st.header("生成旅行计划")
+
+            st.subheader("输入方式")
+            input_method = st.radio("选择输入方式", ["文本输入", "语音录制"])
+
+            user_input = ""
+
+            if input_method == "文本输入":
+                user_input = st.text_area("请输入您的旅行需求", placeholder="例如：去日本5天，预算1万", height=100)
+            else:
+                st.info("💡 录音提示：\n- 请在安静环境下录音\n- 靠近麦克风，说话清晰\n- 录音时长建议3-10秒\n- 避免使用填充词（如'嗯'、'啊'）")
+                st.write("点击下方按钮开始录制语音")
+                from audiorecorder import audiorecorder
+                audio = audiorecorder("点击录制", "点击停止")
+
+                if len(audio) > 0:
+                    st.audio(audio.export(format="wav").read(), format="audio/wav")
+                    st.success("语音录制完成！")
+
+                    recording_key = hashlib.md5(audio.raw_data).hexdigest()
+                    if st.session_state.get("recording_key") != recording_key:
+                        with st.spinner("正在识别语音..."):
+                            st.session_state.recognized_text = speech_to_text(audio)
+                        st.session_state.recording_key = recording_key
+
+                    recognized_text = st.session_state.recognized_text
                     if recognized_text:
                         st.success(f"识别结果：{recognized_text}")
                         user_input = recognized_text
                     else:
                         st.warning("语音识别失败，请重试或使用文本输入")
-        
-        if st.button("生成行程") and user_input:
-            if not st.session_state.api_key:
-                st.error("请先在侧边栏设置 API Key")
-            else:
-                with st.spinner("正在生成旅行计划..."):
-                    result = call_llm(user_input)
-                    
-                    if result:
-                        st.subheader("旅行计划")
-                        st.markdown(result.get("itinerary_text", ""))
-                        
-                        coordinates = result.get("coordinates", [])
-                        if coordinates:
-                            st.subheader("行程地图")
-                            df = pd.DataFrame(coordinates)
-                            st.map(df, latitude="lat", longitude="lon", size=200, color="#0044ff")
-                            
-                            content_json = json.dumps(result, ensure_ascii=False)
-                            save_itinerary(st.session_state.user_id, content_json)
-                            
-                            latest = get_latest_itinerary(st.session_state.user_id)
-                            if latest:
-                                st.session_state.current_itinerary_id = latest.id
-                                st.success("行程已保存！")
-        
-        st.divider()
-        
-        st.subheader("历史行程")
-        itineraries = get_user_itineraries(st.session_state.user_id)
-        if itineraries:
-            for idx, itinerary in enumerate(reversed(itineraries[-5:])):
-                with st.expander(f"行程 #{len(itineraries) - idx}"):
+
+            if st.button("生成行程") and user_input:
+                if not st.session_state.api_key:
+                    st.error("请先在侧边栏设置 API Key")
+                else:
+                    job_id = submit_generation_job(st.session_state.user_id, user_input, st.session_state.api_key, st.session_state.api_base_url)
+                    if job_id:
+                        st.session_state.active_job_id = job_id
+                        st.session_state.job_polling = True
+                    else:
+                        st.error("生成任务提交失败，请重试")
+
+            if not st.session_state.pending_job_checked:
+                st.session_state.pending_job_checked = True
+                pending_job = get_pending_generation_job(st.session_state.user_id)
+                if pending_job:
+                    st.session_state.active_job_id = pending_job.id
+                    st.session_state.job_polling = pending_job.status in ACTIVE_JOB_STATUSES
+                latest_batch_id = get_latest_batch_id(st.session_state.user_id)
+                if latest_batch_id and any(job[2] in ACTIVE_JOB_STATUSES for job in get_batch_jobs(latest_batch_id)):
+                    st.session_state.active_batch_id = latest_batch_id
+                    st.session_state.batch_polling = True
+
+            if st.session_state.active_job_id:
+                poll_interval = JOB_POLL_INTERVAL if st.session_state.job_polling else None
+                st.fragment(render_generation_job, run_every=poll_interval)()
+
+            with st.expander("批量生成"):
+                st.caption(f"上传 CSV 文件，每行一个行程需求（最多 {BATCH_MAX_PROMPTS} 行）。可以使用 prompt（需求）列直接填写需求，或使用 destination（目的地）、days（天数）、budget（预算）、notes（备注）列组合生成。")
+                batch_file = st.file_uploader("上传 CSV", type=["csv"])
+                if batch_file is not None:
                     try:
-                        content = json.loads(itinerary.content)
-                        st.markdown(content.get("itinerary_text", ""))
-                    except:
-                        st.text(itinerary.content)
-                    
-                    col1, col2 = st.columns([1, 1])
-                    with col1:
-                        if st.button(f"删除此行程", key=f"del_itinerary_{itinerary.id}"):
-                            if delete_itinerary(itinerary.id):
-                                st.success("行程已删除！")
-                                st.rerun()
+                        batch_prompts = read_batch_csv(batch_file.getvalue())
+                    except BatchInputError as e:
+                        batch_prompts = []
+                        st.error(str(e))
+                    if batch_prompts:
+                        st.dataframe({"需求": batch_prompts}, hide_index=True)
+                        if st.button(f"批量生成 {len(batch_prompts)} 个行程"):
+                            if not st.session_state.api_key:
+                                st.error("请先在侧边栏设置 API Key")
                             else:
-                                st.error("删除失败")
-                    with col2:
-                        if st.button(f"为此行程记账", key=f"expense_{itinerary.id}"):
-                            st.session_state.current_itinerary_id = itinerary.id
-                            st.success(f"已选择行程 #{len(itineraries) - idx} 进行记账")
-        else:
-            st.info("暂无历史行程")
-    
-    with tab2:
-        st.header("费用记账")
-        
-        st.subheader("添加费用记录")
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            expense_item = st.text_input("项目", placeholder="例如：吃饭、交通、住宿")
-        with col2:
-            expense_amount = st.number_input("费用（元）", min_value=0.0, step=0.01, format="%.2f")
-        
-        col1, col2 = st.columns([1, 1])
-        with col1:
-            if st.button("添加记录"):
-                if not expense_item:
-                    st.error("请输入项目名称")
-                elif expense_amount <= 0:
-                    st.error("请输入有效的费用金额")
-                else:
-                    if add_expense(st.session_state.user_id, expense_item, expense_amount, st.session_state.current_itinerary_id):
-                        st.success("费用记录已添加！")
+                                batch_id = submit_generation_batch(st.session_state.user_id, batch_prompts, st.session_state.api_key, st.session_state.api_base_url)
+                                if batch_id:
+                                    st.session_state.active_batch_id = batch_id
+                                    st.session_state.batch_polling = True
+                                else:
+                                    st.error("批量任务提交失败，请重试")
+
+            if st.session_state.active_batch_id:
+                poll_interval = BATCH_POLL_INTERVAL if st.session_state.batch_polling else None
+                st.fragment(render_generation_batch, run_every=poll_interval)()
+
+            st.divider()
+
+            st.subheader("历史行程")
+            itinerary_count = count_user_itineraries(st.session_state.user_id)
+            if itinerary_count:
+                history = []
+                before_id = None
+                for _ in range(st.session_state.history_pages):
+                    page = get_itinerary_page(st.session_state.user_id, before_id, HISTORY_PAGE_SIZE)
+                    if not page:
+                        break
+                    history.extend(page)
+                    before_id = page[-1][0]
+
+                for idx, (itinerary_id, summary) in enumerate(history):
+                    itinerary_number = itinerary_count - idx
+                    title = f"行程 #{itinerary_number}：{summary}" if summary else f"行程 #{itinerary_number}"
+                    with st.expander(title):
+                        if st.toggle("显示详情", key=f"show_itinerary_{itinerary_id}"):
+                            refine_notice = st.session_state.pop(f"refine_notice_{itinerary_id}", None)
+                            if refine_notice:
+                                st.success(refine_notice)
+                            itinerary_result = get_itinerary_result(itinerary_id) or {}
+                            st.markdown(itinerary_result.get("itinerary_text", ""))
+
+                            instruction = st.text_input("修改要求", placeholder="例如：在京都多待一天、把预算降到8000元", key=f"refine_input_{itinerary_id}")
+                            if st.button("按要求修改", key=f"refine_{itinerary_id}") and instruction:
+                                if not st.session_state.api_key:
+                                    st.error("请先在侧边栏设置 API Key")
+                                else:
+                                    from refinement import refine_itinerary
+                                    try:
+                                        with st.spinner("正在修改行程..."):
+                                            version, unapplied = refine_itinerary(itinerary_id, instruction, st.session_state.api_key, st.session_state.api_base_url)
+                                    except Exception as e:
+                                        st.error(f"修改失败: {str(e)}")
+                                    else:
+                                        skipped = f"，{len(unapplied)} 处文字修改未找到原文已跳过" if unapplied else ""
+                                        st.session_state[f"refine_notice_{itinerary_id}"] = f"已更新为版本 {version}{skipped}"
+                                        st.rerun()
+
+                            versions = get_itinerary_versions(itinerary_id)
+                            if versions:
+                                version_labels = {version: f"版本 {version}：{change_note or instruction or ''}" for version, instruction, change_note, _ in versions}
+                                selected_version = st.selectbox("版本历史", list(version_labels), format_func=version_labels.get, key=f"versions_{itinerary_id}")
+                                if st.button("恢复此版本", key=f"restore_{itinerary_id}", disabled=selected_version == versions[0][0]):
+                                    from refinement import restore_itinerary_version
+                                    try:
+                                        restored = restore_itinerary_version(itinerary_id, selected_version)
+                                    except Exception as e:
+                                        st.error(f"恢复失败: {str(e)}")
+                                    else:
+                                        st.session_state[f"refine_notice_{itinerary_id}"] = f"已恢复为版本 {selected_version}（新版本 {restored}）"
+                                        st.rerun()
+
+                        col1, col2 = st.columns([1, 1])
+                        with col1:
+                            if st.button(f"删除此行程", key=f"del_itinerary_{itinerary_id}"):
+                                if delete_itinerary(itinerary_id):
+                                    st.success("行程已删除！")
+                                    st.rerun()
+                                else:
+                                    st.error("删除失败")
+                        with col2:
+                            if st.button(f"为此行程记账", key=f"expense_{itinerary_id}"):
+                                st.session_state.current_itinerary_id = itinerary_id
+                                st.success(f"已选择行程 #{itinerary_number} 进行记账")
+
+                if len(history) < itinerary_count:
+                    if st.button("加载更多"):
+                        st.session_state.history_pages += 1
+                        st.rerun()
+            else:
+                st.info("暂无历史行程")
+
+        with tab2:
+            from expense_analytics import expense_frame, summarize, totals_by, budget_vs_actual, diff_edits
+
+            st.header("费用记账")
+
+            st.subheader("添加费用记录")
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                expense_item = st.text_input("项目", placeholder="例如：吃饭、交通、住宿")
+            with col2:
+                expense_amount = st.number_input("费用（元）", min_value=0.0, step=0.01, format="%.2f")
+
+            col1, col2 = st.columns([1, 1])
+            with col1:
+                if st.button("添加记录"):
+                    if not expense_item:
+                        st.error("请输入项目名称")
+                    elif expense_amount <= 0:
+                        st.error("请输入有效的费用金额")
                     else:
-                        st.error("添加失败")
-        with col2:
-            if st.button("清除当前行程"):
-                st.session_state.current_itinerary_id = None
-                st.info("已清除当前行程选择")
-        
-        if st.session_state.current_itinerary_id:
-            st.info(f"当前正在为行程 #{st.session_state.current_itinerary_id} 记账")
-        
-        st.divider()
-        
-        st.subheader("总花销")
-        total = get_total_budget(st.session_state.user_id)
-        st.metric("总花销", f"{total} 元")
-        
-        st.subheader("费用明细")
-        expenses = get_user_expenses(st.session_state.user_id, st.session_state.current_itinerary_id)
-        if expenses:
-            for idx, expense in enumerate(expenses):
-                col1, col2, col3 = st.columns([3, 2, 1])
+                        if add_expense(st.session_state.user_id, expense_item, expense_amount, st.session_state.current_itinerary_id):
+                            st.success("费用记录已添加！")
+                        else:
+                            st.error("添加失败")
+            with col2:
+                if st.button("清除当前行程"):
+                    st.session_state.current_itinerary_id = None
+                    st.info("已清除当前行程选择")
+
+            if st.session_state.current_itinerary_id:
+                st.info(f"当前正在为行程 #{st.session_state.current_itinerary_id} 记账")
+
+            st.divider()
+
+            st.subheader("总花销")
+            total = get_total_budget(st.session_state.user_id)
+            st.metric("总花销", f"{total} 元")
+
+            expense_df = expense_frame(get_expense_rows(st.session_state.user_id, st.session_state.current_itinerary_id))
+            if expense_df.empty:
+                st.subheader("费用明细")
+                st.info("暂无费用记录")
+            else:
+                st.subheader("费用分析")
+                summary = summarize(expense_df)
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("合计", f"¥{summary['total']:.2f}")
+                col2.metric("笔数", summary["count"])
+                col3.metric("日均", f"¥{summary['daily_average']:.2f}")
+                col4.metric("单笔最高", f"¥{summary['largest']:.2f}")
+
+                col1, col2 = st.columns(2)
                 with col1:
-                    st.write(f"**{expense.item}**")
+                    st.caption("按项目")
+                    st.bar_chart(totals_by(expense_df, "category")["total"].head(15).rename("金额"), horizontal=True)
                 with col2:
-                    st.write(f"¥{expense.amount:.2f}")
-                with col3:
-                    if st.button("删除", key=f"del_expense_{expense.id}"):
-                        if delete_expense(expense.id):
-                            st.success("费用记录已删除！")
-                            st.rerun()
-                        else:
-                            st.error("删除失败")
-                st.divider()
-        else:
-            st.info("暂无费用记录")
+                    st.caption("按日期")
+                    st.bar_chart(totals_by(expense_df, "day")["total"].rename("金额"))
+
+                budget_df = budget_vs_actual(expense_df, get_itinerary_budgets(st.session_state.user_id))
+                if not budget_df.empty:
+                    st.caption("预算与实际花费")
+                    budget_view = budget_df.assign(行程=budget_df["itinerary_id"].map(lambda i: f"#{i}") + " " + budget_df["summary"].fillna("").str.slice(0, 20))
+                    st.bar_chart(budget_view.set_index("行程")[["estimated_budget", "actual"]].rename(columns={"estimated_budget": "预算", "actual": "实际"}), stack=False)
+                    st.dataframe(budget_view[["行程", "estimated_budget", "actual", "remaining", "usage"]].rename(columns={"estimated_budget": "预算", "actual": "实际", "remaining": "剩余", "usage": "使用率"}), hide_index=True, column_config={"预算": st.column_config.NumberColumn(format="¥%.2f"), "实际": st.column_config.NumberColumn(format="¥%.2f"), "剩余": st.column_config.NumberColumn(format="¥%.2f"), "使用率": st.column_config.ProgressColumn(format="percent", min_value=0.0, max_value=1.0)})
+
+                st.subheader("费用明细")
+                editor_df = expense_df.set_index("id")[["item", "amount", "itinerary_id", "created_at"]].assign(delete=False)
+                edited_df = st.data_editor(
+                    editor_df,
+                    key=f"expense_editor_{st.session_state.current_itinerary_id}",
+                    hide_index=True,
+                    num_rows="fixed",
+                    disabled=["itinerary_id", "created_at"],
+                    column_config={
+                        "item": st.column_config.TextColumn("项目", required=True, max_chars=100),
+                        "amount": st.column_config.NumberColumn("金额（元）", min_value=0.01, step=0.01, format="%.2f", required=True),
+                        "itinerary_id": st.column_config.NumberColumn("行程", format="#%d"),
+                        "created_at": st.column_config.DatetimeColumn("时间", format="YYYY-MM-DD HH:mm"),
+                        "delete": st.column_config.CheckboxColumn("删除"),
+                    },
+                )
+                changes, delete_ids = diff_edits(editor_df, edited_df)
+                if changes or delete_ids:
+                    st.caption(f"待保存：修改 {len(changes)} 条，删除 {len(delete_ids)} 条")
+                if st.button("保存修改", disabled=not (changes or delete_ids)):
+                    if any(not item for _, item, _ in changes):
+                        st.error("请输入项目名称")
+                    elif any(not amount or amount <= 0 for _, _, amount in changes):
+                        st.error("请输入有效的费用金额")
+                    elif (not changes or update_expenses(st.session_state.user_id, changes)) and (not delete_ids or delete_expenses(st.session_state.user_id, delete_ids)):
+                        st.success("费用记录已更新！")
+                        st.rerun()
+                    else:
+                        st.error("保存失败")
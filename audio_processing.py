@@ -0,0 +1,92 @@
+import io
+import os
+from typing import List
+
+import numpy as np
+from pydub import AudioSegment
+
+ASR_SAMPLE_RATE = 16000
+ASR_TARGET_DBFS = -20.0
+ASR_MIN_DBFS = float(os.getenv("ASR_MIN_DBFS", "-55"))
+ASR_MIN_SPEECH_MS = int(os.getenv("ASR_MIN_SPEECH_MS", "300"))
+ASR_CHUNK_MS = min(int(os.getenv("ASR_CHUNK_MS", "60000")), 60000)
+VAD_FRAME_MS = 20
+VAD_SILENCE_OFFSET_DB = float(os.getenv("VAD_SILENCE_OFFSET_DB", "16"))
+VAD_MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "300"))
+VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", "200"))
+
+
+def load_segment(audio) -> AudioSegment:
+    if isinstance(audio, AudioSegment):
+        return audio
+    return AudioSegment.from_file(io.BytesIO(audio))
+
+
+def _to_asr_format(audio) -> AudioSegment:
+    return load_segment(audio).set_frame_rate(ASR_SAMPLE_RATE).set_channels(1).set_sample_width(2)
+
+
+def _normalize(segment: AudioSegment) -> AudioSegment:
+    if segment.rms == 0:
+        return segment
+    return segment.apply_gain(ASR_TARGET_DBFS - segment.dBFS)
+
+
+def to_asr_segment(audio) -> AudioSegment:
+    return _normalize(_to_asr_format(audio))
+
+
+def _frame_levels(segment: AudioSegment) -> np.ndarray:
+    samples = np.frombuffer(segment.raw_data, dtype=np.int16).astype(np.float32)
+    frame_size = ASR_SAMPLE_RATE * VAD_FRAME_MS // 1000
+    frame_count = len(samples) // frame_size
+    frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1.0) / 32768)
+
+
+def detect_speech(segment: AudioSegment) -> List[tuple]:
+    levels = _frame_levels(segment)
+    voiced = levels > segment.dBFS - VAD_SILENCE_OFFSET_DB
+    if not voiced.any():
+        return []
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    long_gaps = (starts[1:] - ends[:-1]) * VAD_FRAME_MS >= VAD_MIN_SILENCE_MS
+    starts = np.concatenate((starts[:1], starts[1:][long_gaps])) * VAD_FRAME_MS
+    ends = np.concatenate((ends[:-1][long_gaps], ends[-1:])) * VAD_FRAME_MS
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def _pack_chunks(segment: AudioSegment, ranges: List[tuple]) -> List[AudioSegment]:
+    chunks, parts, length, previous_end = [], [], 0, 0
+
+    def flush():
+        nonlocal parts, length
+        if parts:
+            chunks.append(sum(parts[1:], parts[0]))
+        parts, length = [], 0
+
+    for start, end in ranges:
+        start, end = max(previous_end, start - VAD_PADDING_MS), min(len(segment), end + VAD_PADDING_MS)
+        previous_end = end
+        while end - start > ASR_CHUNK_MS:
+            flush()
+            chunks.append(segment[start:start + ASR_CHUNK_MS])
+            start += ASR_CHUNK_MS
+        if length + end - start > ASR_CHUNK_MS:
+            flush()
+        parts.append(segment[start:end])
+        length += end - start
+    flush()
+    return chunks
+
+
+def prepare_asr_chunks(audio) -> List[AudioSegment]:
+    segment = _to_asr_format(audio)
+    if segment.rms == 0 or segment.dBFS < ASR_MIN_DBFS:
+        return []
+    ranges = detect_speech(segment)
+    if sum(end - start for start, end in ranges) < ASR_MIN_SPEECH_MS:
+        return []
+    return [_normalize(chunk) for chunk in _pack_chunks(segment, ranges)]
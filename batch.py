@@ -0,0 +1,114 @@
+import asyncio
+import csv
+import io
+import json
+import os
+from typing import List, Optional
+
+from database import save_itinerary, update_generation_job
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_PROMPTS = int(os.getenv("BATCH_MAX_PROMPTS", "200"))
+
+PROMPT_COLUMNS = ("prompt", "需求", "旅行需求")
+FIELD_COLUMNS = {
+    "destination": ("destination", "目的地"),
+    "days": ("days", "天数"),
+    "budget": ("budget", "预算"),
+    "notes": ("notes", "备注", "其他要求"),
+}
+
+
+class BatchInputError(ValueError):
+    pass
+
+
+def _decode(data: bytes) -> str:
+    for encoding in ("utf-8-sig", "gb18030"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    import chardet
+    return data.decode(chardet.detect(data)["encoding"] or "utf-8", errors="replace")
+
+
+def _field(row: dict, names: tuple) -> str:
+    for name in names:
+        value = (row.get(name) or "").strip()
+        if value:
+            return value
+    return ""
+
+
+def _build_prompt(row: dict) -> str:
+    prompt = _field(row, PROMPT_COLUMNS)
+    if prompt:
+        return prompt
+    destination, days, budget, notes = (_field(row, FIELD_COLUMNS[key]) for key in ("destination", "days", "budget", "notes"))
+    if not destination:
+        return ""
+    parts = [f"去{destination}" + (f"{days}天" if days else "")]
+    if budget:
+        parts.append(f"预算{budget}" + ("" if budget[-1] in "元万千" else "元"))
+    if notes:
+        parts.append(notes)
+    return "，".join(parts)
+
+
+def read_batch_csv(data: bytes) -> List[str]:
+    reader = csv.DictReader(io.StringIO(_decode(data)))
+    headers = {(name or "").strip().lower() for name in reader.fieldnames or []}
+    if not headers & set(PROMPT_COLUMNS + FIELD_COLUMNS["destination"]):
+        raise BatchInputError("CSV 需要包含 prompt（需求）列，或 destination（目的地）列")
+    prompts = []
+    for row in reader:
+        prompt = _build_prompt({(key or "").strip().lower(): value for key, value in row.items() if isinstance(value, str)})
+        if prompt:
+            prompts.append(prompt)
+    if not prompts:
+        raise BatchInputError("CSV 中没有有效的行程需求")
+    if len(prompts) > BATCH_MAX_PROMPTS:
+        raise BatchInputError(f"单次最多批量生成 {BATCH_MAX_PROMPTS} 个行程，当前 {len(prompts)} 个")
+    return prompts
+
+
+async def generate_batch_async(user_id: int, prompts: List[str], api_key: str, base_url: str = None, concurrency: int = BATCH_MAX_CONCURRENCY, job_ids: Optional[List[int]] = None, on_progress=None) -> List[dict]:
+    import openai
+    from llm import call_llm_async, summarize_itinerary
+    client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url or None, max_retries=0)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    finished = 0
+
+    async def run(index: int, prompt: str) -> dict:
+        nonlocal finished
+        job_id = job_ids[index] if job_ids else None
+        async with semaphore:
+            if job_id:
+                await asyncio.to_thread(update_generation_job, job_id, "running")
+            try:
+                result = await call_llm_async(prompt, client, api_key, base_url, background=True)
+                content_json = json.dumps(result, ensure_ascii=False)
+                itinerary_id = None
+                if result.get("coordinates"):
+                    itinerary_id = await asyncio.to_thread(save_itinerary, user_id, content_json, None, summarize_itinerary(result.get("itinerary_text", "")))
+                outcome = {"index": index, "prompt": prompt, "status": "succeeded", "itinerary_id": itinerary_id, "result": result, "error": None}
+                if job_id:
+                    await asyncio.to_thread(update_generation_job, job_id, "succeeded", content_json, None, itinerary_id)
+            except Exception as e:
+                outcome = {"index": index, "prompt": prompt, "status": "failed", "itinerary_id": None, "result": None, "error": str(e)}
+                if job_id:
+                    await asyncio.to_thread(update_generation_job, job_id, "failed", None, str(e))
+        finished += 1
+        if on_progress:
+            on_progress(finished, len(prompts), outcome)
+        return outcome
+
+    try:
+        return list(await asyncio.gather(*(run(index, prompt) for index, prompt in enumerate(prompts))))
+    finally:
+        await client.close()
+
+
+def generate_batch(user_id: int, prompts: List[str], api_key: str, base_url: str = None, concurrency: int = BATCH_MAX_CONCURRENCY, job_ids: Optional[List[int]] = None, on_progress=None) -> List[dict]:
+    return asyncio.run(generate_batch_async(user_id, prompts, api_key, base_url, concurrency, job_ids, on_progress))
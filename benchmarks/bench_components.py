@@ -0,0 +1,50 @@
+import time
+import uuid
+
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from benchmarks.stubs import STUB_ITINERARY, stub_base_url
+from llm import call_llm, call_llm_patch
+from audio_processing import prepare_asr_chunks, to_asr_segment
+from speech import recognize_speech
+from geo import plan_route
+from gazetteer import correct_coordinates
+
+
+def _time(func, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def recording(duration_ms: int = 5000):
+    return Sine(440).to_audio_segment(duration=duration_ms, volume=-20).set_frame_rate(44100).set_channels(2)
+
+
+def long_recording(utterances: int = 30, utterance_ms: int = 4000, pause_ms: int = 600):
+    utterance = recording(utterance_ms)
+    pause = AudioSegment.silent(duration=pause_ms, frame_rate=44100).set_channels(2)
+    return sum([utterance + pause] * utterances, pause)
+
+
+def run_component_benchmarks(server, iterations: int, remote_iterations: int) -> dict:
+    base_url = f"{stub_base_url(server)}/v1"
+    audio = recording()
+    long_audio = long_recording()
+    coordinates = STUB_ITINERARY["coordinates"] * 5
+
+    return {
+        "component.call_llm": _time(lambda: call_llm(f"去日本5天，预算1万，编号 {uuid.uuid4().hex}", "bench", base_url), remote_iterations),
+        "component.call_llm_patch": _time(lambda: call_llm_patch(STUB_ITINERARY, f"第5天多安排两个景点，编号 {uuid.uuid4().hex}", "bench", base_url), remote_iterations),
+        "component.asr_recognize": _time(lambda: recognize_speech(audio, "bench", "bench", "bench"), remote_iterations),
+        "component.asr_recognize[long]": _time(lambda: recognize_speech(long_audio, "bench", "bench", "bench"), remote_iterations),
+        "component.to_asr_segment": _time(lambda: to_asr_segment(audio), iterations),
+        "component.prepare_asr_chunks": _time(lambda: prepare_asr_chunks(audio), iterations),
+        "component.prepare_asr_chunks[long]": _time(lambda: prepare_asr_chunks(long_audio), max(1, iterations // 10)),
+        "component.correct_coordinates": _time(lambda: correct_coordinates(coordinates), iterations),
+        "component.plan_route": _time(lambda: plan_route(coordinates), iterations),
+    }
@@ -0,0 +1,153 @@
+import json
+import random
+import time
+import uuid
+
+import database
+from database import SessionLocal, Itinerary, Expense
+from benchmarks.stubs import STUB_ITINERARY
+
+
+def _load_fixtures(user_ids: list, rng: random.Random) -> dict:
+    db = SessionLocal()
+    try:
+        itineraries = {}
+        for itinerary_id, user_id in db.query(Itinerary.id, Itinerary.user_id).filter(Itinerary.user_id.in_(user_ids)).all():
+            itineraries.setdefault(user_id, []).append(itinerary_id)
+        expense_ids = [row[0] for row in db.query(Expense.id).filter(Expense.user_id.in_(user_ids)).order_by(Expense.id.desc()).limit(10000).all()]
+    finally:
+        db.close()
+    rng.shuffle(expense_ids)
+    return {
+        "rng": rng,
+        "user_ids": user_ids,
+        "itineraries": itineraries,
+        "itinerary_users": [user_id for user_id in user_ids if user_id in itineraries],
+        "expense_ids": expense_ids,
+        "created_itineraries": [],
+        "created_jobs": [],
+        "batch_ids": [],
+        "cache_keys": [],
+        "content": json.dumps(STUB_ITINERARY, ensure_ascii=False),
+    }
+
+
+def _user(ctx: dict) -> int:
+    return ctx["rng"].choice(ctx["user_ids"])
+
+
+def _itinerary(ctx: dict) -> tuple:
+    user_id = ctx["rng"].choice(ctx["itinerary_users"])
+    return user_id, ctx["rng"].choice(ctx["itineraries"][user_id])
+
+
+def _expense_args(ctx: dict) -> tuple:
+    user_id, itinerary_id = _itinerary(ctx)
+    return user_id, ctx["rng"].choice(["午餐", "地铁", "门票"]), round(ctx["rng"].uniform(5, 500), 2), itinerary_id
+
+
+def _expense_changes(ctx: dict) -> tuple:
+    user_id = _user(ctx)
+    rows = database.get_expense_rows(user_id)[:20]
+    return user_id, [(expense_id, item, round(amount + 1, 2)) for expense_id, _, item, amount, _ in rows]
+
+
+def _revision_args(ctx: dict) -> tuple:
+    itinerary_id = _itinerary(ctx)[1]
+    return database.save_itinerary_revision, (itinerary_id, STUB_ITINERARY, "第5天多安排两个景点", None, "基准测试", database.get_latest_itinerary_version(itinerary_id))
+
+
+def _username(ctx: dict) -> str:
+    return f"bench_user_{_user(ctx)}"
+
+
+def _remember(key: str):
+    return lambda ctx, result: result is not None and ctx[key].append(result)
+
+
+def _pop(ctx: dict, key: str):
+    return ctx[key].pop() if ctx[key] else None
+
+
+def _new_cache_key(ctx: dict) -> tuple:
+    key = (uuid.uuid4().hex, uuid.uuid4().hex)
+    ctx["cache_keys"].append(key)
+    return key
+
+
+def _new_batch_id(ctx: dict) -> str:
+    batch_id = uuid.uuid4().hex
+    ctx["batch_ids"].append(batch_id)
+    return batch_id
+
+
+def _cached_key(ctx: dict) -> tuple:
+    return ctx["rng"].choice(ctx["cache_keys"]) if ctx["cache_keys"] else ("missing", "missing")
+
+
+# Each case maps the fixtures to (function, args[, after]); only the call itself is timed.
+CASES = [
+    ("init_db", lambda ctx: (database.init_db, ())),
+    ("register_user", lambda ctx: (database.register_user, (f"bench_new_{uuid.uuid4().hex}", "benchmark"))),
+    ("authenticate_user", lambda ctx: (database.authenticate_user, (_username(ctx), "benchmark"))),
+    ("get_user_by_username", lambda ctx: (database.get_user_by_username, (_username(ctx),))),
+    ("save_itinerary", lambda ctx: (database.save_itinerary, (_user(ctx), ctx["content"], None, "东京、京都五日游"), _remember("created_itineraries"))),
+    ("get_user_itineraries", lambda ctx: (database.get_user_itineraries, (_user(ctx),))),
+    ("count_user_itineraries", lambda ctx: (database.count_user_itineraries, (_user(ctx),))),
+    ("get_itinerary_page", lambda ctx: (database.get_itinerary_page, (_user(ctx), None, 5))),
+    ("get_latest_itinerary", lambda ctx: (database.get_latest_itinerary, (_user(ctx),))),
+    ("get_itinerary_budgets", lambda ctx: (database.get_itinerary_budgets, (_user(ctx),))),
+    ("get_itinerary_content", lambda ctx: (database.get_itinerary_content, (_itinerary(ctx)[1],))),
+    ("get_itinerary_result", lambda ctx: (database.get_itinerary_result, (_itinerary(ctx)[1],))),
+    ("get_itinerary_stops", lambda ctx: (database.get_itinerary_stops, (_itinerary(ctx)[1],))),
+    ("get_stops_in_bbox", lambda ctx: (database.get_stops_in_bbox, (_user(ctx), 34.0, 135.0, 36.5, 140.5))),
+    ("get_latest_itinerary_version", lambda ctx: (database.get_latest_itinerary_version, (_itinerary(ctx)[1],))),
+    ("get_itinerary_versions", lambda ctx: (database.get_itinerary_versions, (_itinerary(ctx)[1],))),
+    ("save_itinerary_revision", lambda ctx: _revision_args(ctx)),
+    ("update_itinerary_budget", lambda ctx: (database.update_itinerary_budget, (_itinerary(ctx)[1], "预算记录"))),
+    ("get_total_budget", lambda ctx: (database.get_total_budget, (_user(ctx),))),
+    ("get_expense_summary", lambda ctx: (database.get_expense_summary, (_user(ctx),))),
+    ("get_expense_totals_by_itinerary", lambda ctx: (database.get_expense_totals_by_itinerary, (_user(ctx),))),
+    ("get_expense_totals_by_category", lambda ctx: (database.get_expense_totals_by_category, (_user(ctx),))),
+    ("get_expense_totals_by_day", lambda ctx: (database.get_expense_totals_by_day, (_user(ctx),))),
+    ("get_user_expenses", lambda ctx: (database.get_user_expenses, (_user(ctx),))),
+    ("get_user_expenses[itinerary]", lambda ctx: (database.get_user_expenses, _itinerary(ctx))),
+    ("get_expense_rows", lambda ctx: (database.get_expense_rows, (_user(ctx),))),
+    ("get_expense_rows[itinerary]", lambda ctx: (database.get_expense_rows, _itinerary(ctx))),
+    ("update_expenses", lambda ctx: (database.update_expenses, _expense_changes(ctx))),
+    ("add_expense", lambda ctx: (database.add_expense, _expense_args(ctx))),
+    ("delete_expense", lambda ctx: (database.delete_expense, (_pop(ctx, "expense_ids") or 0,))),
+    ("delete_expenses", lambda ctx: (database.delete_expenses, (_user(ctx), [_pop(ctx, "expense_ids") or 0 for _ in range(5)]))),
+    ("delete_itinerary", lambda ctx: (database.delete_itinerary, (_pop(ctx, "created_itineraries") or 0,))),
+    ("save_llm_cache_entry", lambda ctx: (database.save_llm_cache_entry, (*_new_cache_key(ctx), ctx["content"], 3600, 100000))),
+    ("get_llm_cache_entry", lambda ctx: (database.get_llm_cache_entry, (*_cached_key(ctx), 3600))),
+    ("create_generation_job", lambda ctx: (database.create_generation_job, (_user(ctx), "去日本5天，预算1万", "bench-worker"), _remember("created_jobs"))),
+    ("create_generation_jobs", lambda ctx: (database.create_generation_jobs, (_user(ctx), ["去日本5天，预算1万"] * 10, "bench-worker", _new_batch_id(ctx)))),
+    ("get_batch_jobs", lambda ctx: (database.get_batch_jobs, (ctx["rng"].choice(ctx["batch_ids"] or ["missing"]),))),
+    ("get_latest_batch_id", lambda ctx: (database.get_latest_batch_id, (_user(ctx),))),
+    ("get_pending_generation_job", lambda ctx: (database.get_pending_generation_job, (_user(ctx),))),
+    ("get_generation_job", lambda ctx: (database.get_generation_job, (ctx["rng"].choice(ctx["created_jobs"] or [0]),))),
+    ("update_generation_job", lambda ctx: (database.update_generation_job, (ctx["rng"].choice(ctx["created_jobs"] or [0]), "succeeded", ctx["content"]))),
+    ("mark_generation_job_delivered", lambda ctx: (database.mark_generation_job_delivered, (ctx["rng"].choice(ctx["created_jobs"] or [0]),))),
+    ("heartbeat_generation_jobs", lambda ctx: (database.heartbeat_generation_jobs, ("bench-worker",))),
+    ("fail_interrupted_generation_jobs", lambda ctx: (database.fail_interrupted_generation_jobs, ("基准测试", 60))),
+    ("backfill_itinerary_structure", lambda ctx: (database.backfill_itinerary_structure, (100,))),
+]
+
+
+def run_database_benchmarks(user_ids: list, iterations: int, seed: int = 0, only: list = None) -> dict:
+    ctx = _load_fixtures(user_ids, random.Random(seed))
+    samples = {}
+    for name, case in CASES:
+        if only and not any(pattern in name for pattern in only):
+            continue
+        timings = []
+        for _ in range(iterations):
+            func, args, *after = case(ctx)
+            started = time.perf_counter()
+            result = func(*args)
+            timings.append((time.perf_counter() - started) * 1000)
+            if after:
+                after[0](ctx, result)
+        samples[f"db.{name}"] = timings
+    return samples
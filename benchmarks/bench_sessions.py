@@ -0,0 +1,100 @@
+import logging
+import os
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import audiorecorder
+from streamlit import logger as streamlit_logger
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bench_components import recording
+from benchmarks.stubs import stub_base_url, route_baidu_to_stub
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+SESSION_TIMEOUT = 60
+GENERATION_TIMEOUT = 120
+POLL_INTERVAL = 0.2
+
+_recordings = {}
+
+
+def _fake_audiorecorder(start_prompt="", stop_prompt="", *args, **kwargs):
+    return _recordings.get("current") or recording(0)
+
+
+def _widget(elements, label: str):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"未找到控件：{label}")
+
+
+def _timed(timings: dict, name: str, func):
+    started = time.perf_counter()
+    at = func()
+    timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+    if at.exception:
+        raise RuntimeError(f"{name} 出错：{at.exception[0].message}")
+    return at
+
+
+def _run_session(user_id: int, base_url: str, voice: bool) -> dict:
+    timings = {}
+    at = AppTest.from_file(APP_PATH, default_timeout=SESSION_TIMEOUT)
+    at.session_state["api_key"] = "bench"
+    at.session_state["api_base_url"] = base_url
+    _timed(timings, "session.first_load", at.run)
+
+    _widget(at.text_input, "用户名").input(f"bench_user_{user_id}")
+    _widget(at.text_input, "密码").input("benchmark")
+    _timed(timings, "session.login", _widget(at.button, "登录").click().run)
+    if not at.session_state["logged_in"]:
+        raise RuntimeError(f"用户 bench_user_{user_id} 登录失败")
+
+    if voice:
+        _timed(timings, "session.voice_input", _widget(at.radio, "选择输入方式").set_value("语音录制").run)
+        _widget(at.radio, "选择输入方式").set_value("文本输入").run()
+
+    _widget(at.text_area, "请输入您的旅行需求").input(f"去日本5天，预算1万，会话 {uuid.uuid4().hex}")
+    started = time.perf_counter()
+    _timed(timings, "session.submit_generation", _widget(at.button, "生成行程").click().run)
+    while at.session_state["job_polling"]:
+        if time.perf_counter() - started > GENERATION_TIMEOUT:
+            raise TimeoutError("行程生成超时")
+        time.sleep(POLL_INTERVAL)
+        _timed(timings, "session.poll_rerun", at.run)
+    timings["session.generation_end_to_end"] = [(time.perf_counter() - started) * 1000]
+
+    if at.toggle:
+        _timed(timings, "session.history_detail", at.toggle[0].set_value(True).run)
+    more = [button for button in at.button if button.label == "加载更多"]
+    if more:
+        _timed(timings, "session.history_load_more", more[0].click().run)
+
+    _widget(at.text_input, "项目").input("午餐")
+    _widget(at.number_input, "费用（元）").set_value(68.0)
+    _timed(timings, "session.add_expense", _widget(at.button, "添加记录").click().run)
+    _timed(timings, "session.idle_rerun", at.run)
+    return timings
+
+
+def _init_worker(stub_url: str):
+    route_baidu_to_stub(stub_url)
+    os.environ["BAIDU_APP_ID"] = os.environ["BAIDU_API_KEY"] = os.environ["BAIDU_SECRET_KEY"] = "bench"
+    _recordings["current"] = recording()
+    audiorecorder.audiorecorder = _fake_audiorecorder
+    streamlit_logger.set_log_level(logging.ERROR)
+
+
+# AppTest drives a process-wide Streamlit runtime, so concurrent sessions run in separate processes.
+def run_session_benchmarks(server, user_ids: list, sessions: int, concurrency: int, voice: bool = True) -> dict:
+    stub_url = stub_base_url(server)
+    samples = {}
+    with ProcessPoolExecutor(max_workers=max(1, concurrency), mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker, initargs=(stub_url,)) as executor:
+        futures = [executor.submit(_run_session, user_ids[i % len(user_ids)], f"{stub_url}/v1", voice) for i in range(sessions)]
+        for future in futures:
+            for name, timings in future.result().items():
+                samples.setdefault(name, []).extend(timings)
+    return samples
@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROCESS_STARTED = time.perf_counter()
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+PROJECT_DIR = os.path.dirname(APP_PATH)
+HEAVY_MODULES = ("pandas", "numpy", "openai", "aip", "pydub", "chardet", "audiorecorder")
+PROFILE_USERNAME = "startup_profile"
+PROFILE_TIMEOUT = 120
+
+
+def _widget(elements, label: str):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"未找到控件：{label}")
+
+
+def _loaded_modules() -> list:
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def _measure(reruns: int) -> dict:
+    from streamlit.testing.v1 import AppTest
+    from metrics import RERUN_SECONDS
+
+    def script_seconds() -> float:
+        with RERUN_SECONDS.lock:
+            state = RERUN_SECONDS.values.get(())
+            return state[1] if state else 0.0
+
+    def timed_run(name: str, run):
+        before = script_seconds()
+        at = run()
+        samples.setdefault(name, []).append((script_seconds() - before) * 1000)
+        if at.exception:
+            raise RuntimeError(f"{name} 出错：{at.exception[0].message}")
+        return at
+
+    samples = {}
+    at = AppTest.from_file(APP_PATH, default_timeout=PROFILE_TIMEOUT)
+    timed_run("startup.first_load", at.run)
+    samples["startup.cold_start"] = [(time.perf_counter() - PROCESS_STARTED) * 1000]
+    login_modules = _loaded_modules()
+    for _ in range(reruns):
+        timed_run("startup.login_page_rerun", at.run)
+
+    from database import register_user
+    register_user(PROFILE_USERNAME, PROFILE_USERNAME)
+    _widget(at.text_input, "用户名").input(PROFILE_USERNAME)
+    _widget(at.text_input, "密码").input(PROFILE_USERNAME)
+    timed_run("startup.login", _widget(at.button, "登录").click().run)
+    if not at.session_state["logged_in"]:
+        raise RuntimeError(f"用户 {PROFILE_USERNAME} 登录失败")
+    for _ in range(reruns):
+        timed_run("startup.rerun", at.run)
+    return {"samples": samples, "modules": {"login_page": login_modules, "logged_in": _loaded_modules()}}
+
+
+def profile_startup(reruns: int = 10, database_url: str = None) -> dict:
+    env = dict(os.environ, METRICS_PORT="", METRICS_DUMP_PATH="")
+    with tempfile.TemporaryDirectory() as directory:
+        env["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(directory, 'startup_profile.db')}"
+        completed = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", str(reruns)], cwd=PROJECT_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"启动分析进程退出码 {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# Runs in a fresh interpreter so the first load pays the real import and bootstrap cost.
+if __name__ == "__main__":
+    import logging
+    from streamlit import logger as streamlit_logger
+
+    streamlit_logger.set_log_level(logging.ERROR)
+    print(json.dumps(_measure(int(sys.argv[1]) if len(sys.argv) > 1 else 10)))
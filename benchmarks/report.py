@@ -0,0 +1,80 @@
+import json
+import platform
+import statistics
+from datetime import datetime
+
+COMPARED_METRICS = ("p50_ms", "p95_ms")
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(samples: dict) -> dict:
+    results = {}
+    for name, timings in samples.items():
+        values = sorted(timings)
+        if not values:
+            continue
+        results[name] = {
+            "count": len(values),
+            "mean_ms": round(statistics.fmean(values), 4),
+            "p50_ms": round(percentile(values, 0.50), 4),
+            "p95_ms": round(percentile(values, 0.95), 4),
+            "p99_ms": round(percentile(values, 0.99), 4),
+            "max_ms": round(values[-1], 4),
+        }
+    return results
+
+
+def build_report(results: dict, config: dict) -> dict:
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+
+
+def save_report(report: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_report(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous[metric], current[metric]
+            change = (after - before) / before if before else 0.0
+            regressed = change > threshold and after - before > min_delta_ms
+            rows.append((name, metric, before, after, change, regressed))
+    return rows
+
+
+def print_results(results: dict):
+    width = max((len(name) for name in results), default=10)
+    print(f"{'名称':<{width - 2}}  {'次数':>6}  {'p50(ms)':>10}  {'p95(ms)':>10}  {'p99(ms)':>10}  {'max(ms)':>10}")
+    for name, stats in results.items():
+        print(f"{name:<{width}}  {stats['count']:>6}  {stats['p50_ms']:>10.3f}  {stats['p95_ms']:>10.3f}  {stats['p99_ms']:>10.3f}  {stats['max_ms']:>10.3f}")
+
+
+def print_comparison(rows: list):
+    width = max((len(row[0]) for row in rows), default=10)
+    for name, metric, before, after, change, regressed in rows:
+        marker = "  <- 退化" if regressed else ""
+        print(f"{name:<{width}}  {metric:<7}  {before:>10.3f} -> {after:>10.3f}  {change:>+8.1%}{marker}")
@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+SUITES = ("db", "components", "sessions", "startup")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="旅行规划助手性能基准测试")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "travel_planning_bench.db"), help="基准测试使用的 SQLite 文件")
+    parser.add_argument("--reuse", action="store_true", help="复用已有的基准数据库，不重新填充数据")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--itineraries-per-user", type=int, default=5)
+    parser.add_argument("--expenses-per-user", type=int, default=50)
+    parser.add_argument("--suites", default=",".join(SUITES), help="要运行的测试组，逗号分隔：db,components,sessions,startup")
+    parser.add_argument("--only", action="append", help="只运行名称包含该字符串的数据库测试，可重复指定")
+    parser.add_argument("--iterations", type=int, default=200, help="每个数据库函数和本地组件的调用次数")
+    parser.add_argument("--remote-iterations", type=int, default=10, help="经过桩服务的大模型和语音识别调用次数")
+    parser.add_argument("--sessions", type=int, default=10, help="模拟的 Streamlit 会话数")
+    parser.add_argument("--concurrency", type=int, default=2, help="同时运行模拟会话的进程数")
+    parser.add_argument("--no-voice", action="store_true", help="模拟会话时跳过语音输入")
+    parser.add_argument("--cold", action="store_true", help="关闭进程内读缓存，测量未命中缓存时的延迟")
+    parser.add_argument("--llm-chunk-delay", type=float, default=0.01, help="桩大模型每个流式分片的延迟（秒）")
+    parser.add_argument("--asr-delay", type=float, default=0.2, help="桩语音识别的响应延迟（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="将结果写入 JSON 文件，可作为之后的基线")
+    parser.add_argument("--baseline", help="与之前保存的结果对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50/p95 超过基线该比例即视为退化")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="绝对增幅低于该值（毫秒）时不计为退化，避免亚毫秒级抖动误报")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        sys.exit(f"未知的测试组：{', '.join(sorted(unknown))}")
+
+    if not args.reuse and os.path.exists(args.db):
+        os.remove(args.db)
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    if args.cold:
+        os.environ["READ_CACHE_MAX_USERS"] = "0"
+
+    from database import init_db
+    from benchmarks.seed import seed_database, get_seeded_user_ids
+    from benchmarks.stubs import start_stub_server, stub_base_url, route_baidu_to_stub
+    from benchmarks import report
+
+    init_db()
+    user_ids = get_seeded_user_ids()
+    if not user_ids:
+        started = time.perf_counter()
+        counts = seed_database(args.users, args.itineraries_per_user, args.expenses_per_user, args.seed)
+        print(f"已填充 {counts['users']} 个用户、{counts['itineraries']} 条行程、{counts['expenses']} 条费用记录，用时 {time.perf_counter() - started:.1f} 秒")
+        user_ids = get_seeded_user_ids()
+
+    server = start_stub_server(args.llm_chunk_delay, args.asr_delay)
+    route_baidu_to_stub(stub_base_url(server))
+
+    samples = {}
+    if "db" in suites:
+        from benchmarks.bench_database import run_database_benchmarks
+        samples.update(run_database_benchmarks(user_ids, args.iterations, args.seed, args.only))
+    if "components" in suites:
+        from benchmarks.bench_components import run_component_benchmarks
+        samples.update(run_component_benchmarks(server, args.iterations, args.remote_iterations))
+    if "sessions" in suites:
+        from benchmarks.bench_sessions import run_session_benchmarks
+        samples.update(run_session_benchmarks(server, user_ids, args.sessions, args.concurrency, not args.no_voice))
+    if "startup" in suites:
+        from benchmarks.bench_startup import profile_startup
+        samples.update(profile_startup()["samples"])
+    server.shutdown()
+
+    results = report.summarize(samples)
+    report.print_results(results)
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+        report.save_report(report.build_report(results, config), args.output)
+        print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        rows = report.compare(results, report.load_report(args.baseline), args.threshold, args.min_delta_ms)
+        print()
+        report.print_comparison(rows)
+        regressions = [row for row in rows if row[-1]]
+        if regressions:
+            print(f"\n{len(regressions)} 项指标较基线退化超过 {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+
+from database import SessionLocal, ARCHIVE_ITINERARY_JSON, User, Itinerary, ItineraryDay, ItineraryStop, Expense
+
+DESTINATIONS = [
+    ("东京", [("浅草寺", 35.7148, 139.7967), ("东京塔", 35.6586, 139.7454), ("明治神宫", 35.6764, 139.6993), ("银座", 35.6717, 139.7650), ("秋叶原", 35.6984, 139.7731)]),
+    ("京都", [("清水寺", 34.9949, 135.7850), ("金阁寺", 35.0394, 135.7292), ("伏见稻荷大社", 34.9671, 135.7727), ("岚山", 35.0094, 135.6668)]),
+    ("上海", [("外滩", 31.2400, 121.4900), ("东方明珠", 31.2397, 121.4998), ("豫园", 31.2272, 121.4921), ("田子坊", 31.2085, 121.4670)]),
+    ("北京", [("故宫", 39.9163, 116.3972), ("天坛", 39.8822, 116.4066), ("颐和园", 39.9999, 116.2755), ("南锣鼓巷", 39.9370, 116.4033)]),
+    ("成都", [("宽窄巷子", 30.6700, 104.0530), ("锦里", 30.6460, 104.0470), ("成都大熊猫繁育研究基地", 30.7330, 104.1460)]),
+    ("巴黎", [("埃菲尔铁塔", 48.8584, 2.2945), ("卢浮宫", 48.8606, 2.3376), ("凯旋门", 48.8738, 2.2950), ("巴黎圣母院", 48.8530, 2.3499)]),
+]
+EXPENSE_ITEMS = ["早餐", "午餐", "晚餐", "地铁", "出租车", "高铁", "酒店", "民宿", "门票", "纪念品", "咖啡", "购物"]
+BATCH_SIZE = 5000
+
+
+def _build_itinerary(rng: random.Random, itinerary_id: int, user_id: int) -> tuple:
+    city, places = rng.choice(DESTINATIONS)
+    day_count = rng.randint(2, 7)
+    days = [{"day": day, "title": f"{city}第{day}天", "estimated_cost": rng.randint(300, 3000)} for day in range(1, day_count + 1)]
+    coordinates = []
+    for day in days:
+        for name, lat, lon in rng.sample(places, min(len(places), rng.randint(2, 4))):
+            coordinates.append({"name": name, "lat": lat + rng.uniform(-0.002, 0.002), "lon": lon + rng.uniform(-0.002, 0.002), "day": day["day"], "estimated_cost": rng.randint(0, 500)})
+    itinerary_text = f"## {city}{day_count}日游\n\n" + "\n".join(f"第{day['day']}天：" + "、".join(point["name"] for point in coordinates if point["day"] == day["day"]) for day in days)
+    result = {"itinerary_text": itinerary_text, "estimated_budget": sum(day["estimated_cost"] for day in days), "days": days, "coordinates": coordinates}
+
+    itinerary = {"id": itinerary_id, "user_id": user_id, "content": json.dumps(result, ensure_ascii=False) if ARCHIVE_ITINERARY_JSON else "", "summary": f"{city}{day_count}日游", "itinerary_text": itinerary_text, "estimated_budget": result["estimated_budget"]}
+    day_rows = [{"itinerary_id": itinerary_id, "day_number": day["day"], "title": day["title"], "estimated_cost": day["estimated_cost"]} for day in days]
+    stop_rows = [{"itinerary_id": itinerary_id, "position": position, "day_number": point["day"], "name": point["name"], "lat": point["lat"], "lon": point["lon"], "estimated_cost": point["estimated_cost"]} for position, point in enumerate(coordinates)]
+    return itinerary, day_rows, stop_rows
+
+
+def _flush(db, model, rows: list):
+    if rows:
+        db.execute(insert(model), rows)
+        rows.clear()
+
+
+def seed_database(users: int, itineraries_per_user: int, expenses_per_user: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        first_user_id = (db.query(func.max(User.id)).scalar() or 0) + 1
+        next_itinerary_id = (db.query(func.max(Itinerary.id)).scalar() or 0) + 1
+        now = datetime.utcnow()
+        pending = {User: [], Itinerary: [], ItineraryDay: [], ItineraryStop: [], Expense: []}
+        counts = {"users": 0, "itineraries": 0, "expenses": 0}
+
+        for user_id in range(first_user_id, first_user_id + users):
+            pending[User].append({"id": user_id, "username": f"bench_user_{user_id}", "password": "benchmark"})
+            itinerary_ids = []
+            for _ in range(rng.randint(max(0, itineraries_per_user // 2), itineraries_per_user * 3 // 2)):
+                itinerary, day_rows, stop_rows = _build_itinerary(rng, next_itinerary_id, user_id)
+                pending[Itinerary].append(itinerary)
+                pending[ItineraryDay].extend(day_rows)
+                pending[ItineraryStop].extend(stop_rows)
+                itinerary_ids.append(next_itinerary_id)
+                next_itinerary_id += 1
+            expense_count = rng.randint(max(0, expenses_per_user // 2), expenses_per_user * 3 // 2)
+            for _ in range(expense_count):
+                pending[Expense].append({"user_id": user_id, "itinerary_id": rng.choice(itinerary_ids) if itinerary_ids and rng.random() < 0.8 else None, "item": rng.choice(EXPENSE_ITEMS), "amount": round(rng.uniform(5, 2000), 2), "created_at": now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))})
+
+            counts["users"] += 1
+            counts["itineraries"] += len(itinerary_ids)
+            counts["expenses"] += expense_count
+            if sum(len(rows) for rows in pending.values()) >= BATCH_SIZE:
+                for model, rows in pending.items():
+                    _flush(db, model, rows)
+
+        for model, rows in pending.items():
+            _flush(db, model, rows)
+        db.commit()
+        return counts
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def get_seeded_user_ids() -> list:
+    db = SessionLocal()
+    try:
+        return [row[0] for row in db.query(User.id).filter(User.username.like("bench_user_%")).all()]
+    finally:
+        db.close()
@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ITINERARY = {
+    "itinerary_text": "## 东京、京都五日游\n\n第1天：抵达东京，游览浅草寺和东京晴空塔。\n第2天：明治神宫、涩谷、新宿。\n第3天：乘新干线前往京都，参观清水寺和祇园。\n第4天：伏见稻荷大社、岚山。\n第5天：金阁寺后返程。\n\n预算：交通 3000 元，住宿 4000 元，餐饮 2000 元，门票 500 元。",
+    "estimated_budget": 9500,
+    "days": [
+        {"day": 1, "title": "东京下町", "estimated_cost": 1500},
+        {"day": 2, "title": "东京都心", "estimated_cost": 1500},
+        {"day": 3, "title": "前往京都", "estimated_cost": 2500},
+        {"day": 4, "title": "京都南部与岚山", "estimated_cost": 2000},
+        {"day": 5, "title": "金阁寺与返程", "estimated_cost": 2000},
+    ],
+    "coordinates": [
+        {"name": "浅草寺", "lat": 35.7148, "lon": 139.7967, "day": 1, "estimated_cost": 0},
+        {"name": "东京晴空塔", "lat": 35.7101, "lon": 139.8107, "day": 1, "estimated_cost": 200},
+        {"name": "明治神宫", "lat": 35.6764, "lon": 139.6993, "day": 2, "estimated_cost": 0},
+        {"name": "涩谷", "lat": 35.6580, "lon": 139.7016, "day": 2, "estimated_cost": 300},
+        {"name": "新宿", "lat": 35.6938, "lon": 139.7034, "day": 2, "estimated_cost": 300},
+        {"name": "清水寺", "lat": 34.9949, "lon": 135.7850, "day": 3, "estimated_cost": 50},
+        {"name": "祇园", "lat": 35.0037, "lon": 135.7750, "day": 3, "estimated_cost": 200},
+        {"name": "伏见稻荷大社", "lat": 34.9671, "lon": 135.7727, "day": 4, "estimated_cost": 0},
+        {"name": "岚山", "lat": 35.0094, "lon": 135.6668, "day": 4, "estimated_cost": 100},
+        {"name": "金阁寺", "lat": 35.0394, "lon": 135.7292, "day": 5, "estimated_cost": 50},
+    ],
+}
+STUB_PATCH = {
+    "change_note": "第5天改为在京都多停留，取消金阁寺后返程",
+    "estimated_budget": 10300,
+    "text_edits": [{"find": "第5天：金阁寺后返程。", "replace": "第5天：金阁寺、二条城，晚上逛锦市场。\n第6天：返程。"}],
+    "days": [
+        {"day": 5, "title": "金阁寺与二条城", "estimated_cost": 1800, "coordinates": [
+            {"name": "金阁寺", "lat": 35.0394, "lon": 135.7292, "estimated_cost": 50},
+            {"name": "二条城", "lat": 35.0142, "lon": 135.7482, "estimated_cost": 100},
+            {"name": "锦市场", "lat": 35.0050, "lon": 135.7650, "estimated_cost": 300},
+        ]},
+        {"day": 6, "title": "返程", "estimated_cost": 1000},
+    ],
+}
+STUB_TRANSCRIPT = "我想去日本旅游5天预算一万"
+CHUNK_SIZE = 8
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith("/oauth/2.0/token"):
+            self._send_json({"access_token": "stub-token", "expires_in": 2592000, "scope": "brain_all_scope audio_voice_assistant_get"})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.endswith("/chat/completions"):
+            self._chat_completion(json.loads(body or b"{}"))
+        elif self.path.startswith("/server_api"):
+            time.sleep(self.server.asr_delay)
+            self._send_json({"err_no": 0, "err_msg": "success.", "sn": "stub", "result": [STUB_TRANSCRIPT]})
+        else:
+            self.send_error(404)
+
+    def _chat_completion(self, request: dict):
+        refining = any("修改要求：" in str(message.get("content", "")) for message in request.get("messages", []))
+        content = json.dumps(STUB_PATCH if refining else STUB_ITINERARY, ensure_ascii=False)
+        if not request.get("stream"):
+            time.sleep(self.server.llm_chunk_delay * (len(content) // CHUNK_SIZE))
+            self._send_json({"id": "stub", "object": "chat.completion", "created": int(time.time()), "model": request.get("model", ""), "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i in range(0, len(content), CHUNK_SIZE):
+            time.sleep(self.server.llm_chunk_delay)
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model", ""), "choices": [{"index": 0, "delta": {"content": content[i:i + CHUNK_SIZE]}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        if (request.get("stream_options") or {}).get("include_usage"):
+            usage = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model", ""), "choices": [], "usage": {"prompt_tokens": 250, "completion_tokens": len(content) // 2, "total_tokens": 250 + len(content) // 2}}
+            self.wfile.write(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def start_stub_server(llm_chunk_delay: float = 0.01, asr_delay: float = 0.2) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.llm_chunk_delay = llm_chunk_delay
+    server.asr_delay = asr_delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stub_base_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def route_baidu_to_stub(base_url: str):
+    from aip import AipSpeech
+    from aip.base import AipBase
+
+    AipBase._AipBase__accessTokenUrl = f"{base_url}/oauth/2.0/token"
+    AipSpeech._AipSpeech__asrUrl = f"{base_url}/server_api"
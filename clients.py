@@ -0,0 +1,57 @@
+import os
+import threading
+from collections import OrderedDict
+
+CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "16"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+ASR_TIMEOUT = float(os.getenv("ASR_TIMEOUT", "15"))
+
+_openai_clients = OrderedDict()
+_speech_clients = OrderedDict()
+_lock = threading.Lock()
+
+
+def _get_or_create(registry: OrderedDict, key: tuple, factory):
+    with _lock:
+        client = registry.get(key)
+        if client is not None:
+            registry.move_to_end(key)
+            return client
+        client = factory()
+        registry[key] = client
+        while len(registry) > CLIENT_POOL_SIZE:
+            registry.popitem(last=False)
+        return client
+
+
+def get_openai_client(api_key: str, base_url: str = None):
+    def create():
+        from openai import OpenAI
+        return OpenAI(api_key=api_key, base_url=base_url or None, max_retries=0)
+
+    return _get_or_create(_openai_clients, (api_key, base_url or None), create)
+
+
+def get_speech_client(app_id: str, api_key: str, secret_key: str):
+    def create():
+        from aip import AipSpeech
+        from requests.adapters import HTTPAdapter
+        client = AipSpeech(app_id, api_key, secret_key)
+        client.setConnectionTimeoutInMillis(int(ASR_TIMEOUT * 1000))
+        client.setSocketTimeoutInMillis(int(ASR_TIMEOUT * 1000))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+        client.s.mount("https://", adapter)
+        client.s.mount("http://", adapter)
+        return client
+
+    return _get_or_create(_speech_clients, (app_id, api_key, secret_key), create)
+
+
+def evict_openai_client(api_key: str, base_url: str = None):
+    with _lock:
+        _openai_clients.pop((api_key, base_url or None), None)
+
+
+def evict_speech_client(app_id: str, api_key: str, secret_key: str):
+    with _lock:
+        _speech_clients.pop((app_id, api_key, secret_key), None)
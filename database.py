@@ -1,17 +1,74 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, Float, DateTime
+from sqlalchemy import create_engine, event, Column, Integer, String, Text, ForeignKey, Float, DateTime, Boolean, Index, func, inspect, text, update, select, insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import QueuePool
 import os
-from datetime import datetime
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from datetime import datetime, timedelta
 from typing import Optional, List
 
+from amounts import parse_amount
+from metrics import DB_QUERY_SECONDS, DB_QUERY_ERRORS, timed
+
 Base = declarative_base()
 
-DATABASE_URL = "sqlite:///travel_planning.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///travel_planning.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+BULK_CHUNK_SIZE = 500
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+ARCHIVE_ITINERARY_JSON = os.getenv("ARCHIVE_ITINERARY_JSON", "true").lower() in ("1", "true", "yes")
+
+
+def _normalize_database_url(url: str) -> str:
+    # Only psycopg 3 is installed; a bare postgresql:// would make SQLAlchemy 2.0 look for psycopg2.
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+def _create_engine(url: str):
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=True)
+
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT / 1000}
+    if ":memory:" in url or url.rstrip("/") == "sqlite:":
+        sqlite_engine = create_engine(url, connect_args=connect_args)
+    else:
+        sqlite_engine = create_engine(url, connect_args=connect_args, poolclass=QueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.close()
+
+    return sqlite_engine
+
+
+engine = _create_engine(_normalize_database_url(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+READ_CACHE_MAX_USERS = int(os.getenv("READ_CACHE_MAX_USERS", "1000"))
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "30"))
+SCHEMA_LOCK_ID = 727361
+
+_read_cache = OrderedDict()
+_read_cache_generations = {}
+_read_cache_stats = {"hits": 0, "misses": 0}
+_read_cache_lock = threading.Lock()
+
 
 class User(Base):
     __tablename__ = "users"
@@ -29,10 +86,75 @@ class Itinerary(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    content = Column(Text, nullable=False)
+    content = Column(Text, nullable=False, default="")
     budget_log = Column(Text, nullable=True)
+    summary = Column(String, nullable=True)
+    itinerary_text = Column(Text, nullable=True)
+    estimated_budget = Column(Float, nullable=True)
 
     user = relationship("User", back_populates="itineraries")
+    days = relationship("ItineraryDay", back_populates="itinerary", cascade="all, delete-orphan", order_by="ItineraryDay.day_number")
+    stops = relationship("ItineraryStop", back_populates="itinerary", cascade="all, delete-orphan", order_by="ItineraryStop.position")
+    versions = relationship("ItineraryVersion", back_populates="itinerary", cascade="all, delete-orphan", order_by="ItineraryVersion.version")
+
+    __table_args__ = (
+        Index("ix_itineraries_user_id_id", "user_id", "id"),
+    )
+
+
+class ItineraryDay(Base):
+    __tablename__ = "itinerary_days"
+
+    id = Column(Integer, primary_key=True, index=True)
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id"), nullable=False)
+    day_number = Column(Integer, nullable=False)
+    title = Column(String, nullable=True)
+    estimated_cost = Column(Float, nullable=True)
+
+    itinerary = relationship("Itinerary", back_populates="days")
+
+    __table_args__ = (
+        Index("ix_itinerary_days_itinerary_id_day_number", "itinerary_id", "day_number"),
+    )
+
+
+class ItineraryStop(Base):
+    __tablename__ = "itinerary_stops"
+
+    id = Column(Integer, primary_key=True, index=True)
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id"), nullable=False)
+    position = Column(Integer, nullable=False)
+    day_number = Column(Integer, nullable=True)
+    name = Column(String, nullable=False)
+    lat = Column(Float, nullable=False)
+    lon = Column(Float, nullable=False)
+    estimated_cost = Column(Float, nullable=True)
+
+    itinerary = relationship("Itinerary", back_populates="stops")
+
+    __table_args__ = (
+        Index("ix_itinerary_stops_itinerary_id_position", "itinerary_id", "position"),
+        Index("ix_itinerary_stops_lat_lon", "lat", "lon"),
+    )
+
+
+class ItineraryVersion(Base):
+    __tablename__ = "itinerary_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    instruction = Column(Text, nullable=True)
+    change_note = Column(Text, nullable=True)
+    patch = Column(Text, nullable=True)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    itinerary = relationship("Itinerary", back_populates="versions")
+
+    __table_args__ = (
+        Index("ix_itinerary_versions_itinerary_id_version", "itinerary_id", "version", unique=True),
+    )
 
 
 class Expense(Base):
@@ -47,9 +169,130 @@ class Expense(Base):
 
     user = relationship("User", back_populates="expenses")
 
+    __table_args__ = (
+        Index("ix_expenses_user_id_created_at", "user_id", "created_at"),
+        Index("ix_expenses_user_id_itinerary_id_created_at", "user_id", "itinerary_id", "created_at"),
+        Index("ix_expenses_itinerary_id", "itinerary_id"),
+    )
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    prompt = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    itinerary_id = Column(Integer, nullable=True)
+    delivered = Column(Boolean, nullable=False, default=False)
+    worker_id = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    batch_id = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_generation_jobs_user_id_id", "user_id", "id"),
+        Index("ix_generation_jobs_status", "status"),
+        Index("ix_generation_jobs_worker_id", "worker_id"),
+        Index("ix_generation_jobs_batch_id", "batch_id"),
+    )
+
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    exact_key = Column(String, unique=True, index=True, nullable=False)
+    normalized_key = Column(String, index=True, nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+_timed_query = timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
+
+
+def _cached_read(func):
+    @wraps(func)
+    def wrapper(user_id, *args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        with _read_cache_lock:
+            user_cache = _read_cache.get(user_id)
+            entry = user_cache.get(key) if user_cache is not None else None
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                _read_cache.move_to_end(user_id)
+                _read_cache_stats["hits"] += 1
+                result = entry[1]
+                return list(result) if isinstance(result, list) else result
+            _read_cache_stats["misses"] += 1
+            generation = _read_cache_generations.get(user_id, 0)
+
+        result = func(user_id, *args, **kwargs)
+
+        with _read_cache_lock:
+            if _read_cache_generations.get(user_id, 0) == generation:
+                _read_cache.setdefault(user_id, {})[key] = (time.monotonic() + READ_CACHE_TTL if READ_CACHE_TTL > 0 else None, result)
+                _read_cache.move_to_end(user_id)
+                while len(_read_cache) > READ_CACHE_MAX_USERS:
+                    _read_cache.popitem(last=False)
+        return list(result) if isinstance(result, list) else result
+
+    return wrapper
+
+
+def invalidate_user_cache(user_id: int):
+    with _read_cache_lock:
+        _read_cache.pop(user_id, None)
+        _read_cache_generations[user_id] = _read_cache_generations.get(user_id, 0) + 1
 
+
+def get_read_cache_stats() -> dict:
+    with _read_cache_lock:
+        stats = dict(_read_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def _add_missing_columns():
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def _create_missing_indexes():
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+@contextmanager
+def _schema_lock():
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:lock_id)"), {"lock_id": SCHEMA_LOCK_ID})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": SCHEMA_LOCK_ID})
+
+
+@_timed_query
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    with _schema_lock():
+        Base.metadata.create_all(bind=engine)
+        _add_missing_columns()
+        _create_missing_indexes()
 
 
 def get_db():
@@ -60,6 +303,7 @@ def get_db():
         db.close()
 
 
+@_timed_query
 def register_user(username: str, password: str) -> bool:
     db = SessionLocal()
     try:
@@ -77,6 +321,7 @@ def register_user(username: str, password: str) -> bool:
         db.close()
 
 
+@_timed_query
 def authenticate_user(username: str, password: str) -> Optional[User]:
     db = SessionLocal()
     try:
@@ -86,6 +331,7 @@ def authenticate_user(username: str, password: str) -> Optional[User]:
         db.close()
 
 
+@_timed_query
 def get_user_by_username(username: str) -> Optional[User]:
     db = SessionLocal()
     try:
@@ -95,20 +341,65 @@ def get_user_by_username(username: str) -> Optional[User]:
         db.close()
 
 
-def save_itinerary(user_id: int, content: str, budget_log: str = None) -> bool:
+def _to_float(value) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        return parse_amount(value)
+    return None
+
+
+def _to_int(value) -> Optional[int]:
+    number = _to_float(value)
+    return int(number) if number is not None else None
+
+
+def _parse_itinerary_content(content: str) -> dict:
+    try:
+        result = json.loads(content)
+    except ValueError:
+        return {"itinerary_text": content}
+    return result if isinstance(result, dict) else {"itinerary_text": content}
+
+
+def _apply_itinerary_structure(itinerary: Itinerary, result: dict):
+    itinerary.itinerary_text = result.get("itinerary_text", "") or ""
+    itinerary.estimated_budget = _to_float(result.get("estimated_budget"))
+    itinerary.days = [
+        ItineraryDay(day_number=_to_int(day.get("day")), title=day.get("title"), estimated_cost=_to_float(day.get("estimated_cost")))
+        for day in result.get("days") or []
+        if isinstance(day, dict) and _to_int(day.get("day")) is not None
+    ]
+    stops = []
+    for point in result.get("coordinates") or []:
+        if not isinstance(point, dict):
+            continue
+        lat, lon = _to_float(point.get("lat")), _to_float(point.get("lon"))
+        if lat is None or lon is None:
+            continue
+        stops.append(ItineraryStop(position=len(stops), day_number=_to_int(point.get("day")), name=str(point.get("name", "")), lat=lat, lon=lon, estimated_cost=_to_float(point.get("estimated_cost"))))
+    itinerary.stops = stops
+
+
+@_timed_query
+def save_itinerary(user_id: int, content: str, budget_log: str = None, summary: str = None) -> Optional[int]:
     db = SessionLocal()
     try:
-        new_itinerary = Itinerary(user_id=user_id, content=content, budget_log=budget_log)
+        new_itinerary = Itinerary(user_id=user_id, content=content if ARCHIVE_ITINERARY_JSON else "", budget_log=budget_log, summary=summary)
+        _apply_itinerary_structure(new_itinerary, _parse_itinerary_content(content))
         db.add(new_itinerary)
         db.commit()
-        return True
+        invalidate_user_cache(user_id)
+        return new_itinerary.id
     except Exception as e:
         db.rollback()
-        return False
+        return None
     finally:
         db.close()
 
 
+@_timed_query
+@_cached_read
 def get_user_itineraries(user_id: int) -> List[Itinerary]:
     db = SessionLocal()
     try:
@@ -118,6 +409,131 @@ def get_user_itineraries(user_id: int) -> List[Itinerary]:
         db.close()
 
 
+@_timed_query
+@_cached_read
+def count_user_itineraries(user_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.count(Itinerary.id)).filter(Itinerary.user_id == user_id).scalar()
+    finally:
+        db.close()
+
+
+@_timed_query
+@_cached_read
+def get_itinerary_page(user_id: int, before_id: int = None, limit: int = 5) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        query = db.query(Itinerary.id, Itinerary.summary).filter(Itinerary.user_id == user_id)
+        if before_id:
+            query = query.filter(Itinerary.id < before_id)
+        rows = query.order_by(Itinerary.id.desc()).limit(limit).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
+@_cached_read
+def get_itinerary_budgets(user_id: int) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        rows = db.query(Itinerary.id, Itinerary.summary, Itinerary.estimated_budget).filter(Itinerary.user_id == user_id).order_by(Itinerary.id).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
+def get_itinerary_content(itinerary_id: int) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        return db.query(Itinerary.content).filter(Itinerary.id == itinerary_id).scalar()
+    finally:
+        db.close()
+
+
+def _load_itinerary_result(db, itinerary_id: int) -> Optional[dict]:
+    header = db.query(Itinerary.itinerary_text, Itinerary.estimated_budget, Itinerary.content).filter(Itinerary.id == itinerary_id).first()
+    if header is None:
+        return None
+    if header.itinerary_text is None:
+        return _parse_itinerary_content(header.content)
+    days = db.query(ItineraryDay.day_number, ItineraryDay.title, ItineraryDay.estimated_cost).filter(ItineraryDay.itinerary_id == itinerary_id).order_by(ItineraryDay.day_number).all()
+    stops = db.query(ItineraryStop.name, ItineraryStop.lat, ItineraryStop.lon, ItineraryStop.day_number, ItineraryStop.estimated_cost).filter(ItineraryStop.itinerary_id == itinerary_id).order_by(ItineraryStop.position).all()
+    return {
+        "itinerary_text": header.itinerary_text,
+        "estimated_budget": header.estimated_budget,
+        "days": [{"day": day_number, "title": title, "estimated_cost": cost} for day_number, title, cost in days],
+        "coordinates": [{"name": name, "lat": lat, "lon": lon, "day": day_number, "estimated_cost": cost} for name, lat, lon, day_number, cost in stops],
+    }
+
+
+@_timed_query
+def get_itinerary_result(itinerary_id: int) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        return _load_itinerary_result(db, itinerary_id)
+    finally:
+        db.close()
+
+
+@_timed_query
+def get_itinerary_stops(itinerary_id: int) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        rows = db.query(ItineraryStop.name, ItineraryStop.lat, ItineraryStop.lon, ItineraryStop.day_number).filter(ItineraryStop.itinerary_id == itinerary_id).order_by(ItineraryStop.position).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
+def get_stops_in_bbox(user_id: int, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        rows = db.query(ItineraryStop.itinerary_id, ItineraryStop.name, ItineraryStop.lat, ItineraryStop.lon).join(Itinerary, Itinerary.id == ItineraryStop.itinerary_id).filter(
+            Itinerary.user_id == user_id,
+            ItineraryStop.lat.between(min_lat, max_lat),
+            ItineraryStop.lon.between(min_lon, max_lon),
+        ).order_by(ItineraryStop.itinerary_id, ItineraryStop.position).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
+def backfill_itinerary_structure(batch_size: int = 100) -> int:
+    db = SessionLocal()
+    try:
+        backfilled = 0
+        last_id = 0
+        while True:
+            batch = db.query(Itinerary).filter(Itinerary.itinerary_text.is_(None), Itinerary.id > last_id).order_by(Itinerary.id).limit(batch_size).all()
+            if not batch:
+                break
+            user_ids = set()
+            for itinerary in batch:
+                last_id = itinerary.id
+                _apply_itinerary_structure(itinerary, _parse_itinerary_content(itinerary.content))
+                if not ARCHIVE_ITINERARY_JSON:
+                    itinerary.content = ""
+                user_ids.add(itinerary.user_id)
+                backfilled += 1
+            db.commit()
+            for user_id in user_ids:
+                invalidate_user_cache(user_id)
+            db.expunge_all()
+        return backfilled
+    except Exception as e:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@_timed_query
+@_cached_read
 def get_latest_itinerary(user_id: int) -> Optional[Itinerary]:
     db = SessionLocal()
     try:
@@ -127,6 +543,65 @@ def get_latest_itinerary(user_id: int) -> Optional[Itinerary]:
         db.close()
 
 
+@_timed_query
+def get_latest_itinerary_version(itinerary_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.coalesce(func.max(ItineraryVersion.version), 0)).filter(ItineraryVersion.itinerary_id == itinerary_id).scalar()
+    finally:
+        db.close()
+
+
+@_timed_query
+def save_itinerary_revision(itinerary_id: int, result: dict, instruction: str, patch: str, change_note: str, base_version: int) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        itinerary = db.query(Itinerary).filter(Itinerary.id == itinerary_id).first()
+        if itinerary is None:
+            return None
+        latest = db.query(func.coalesce(func.max(ItineraryVersion.version), 0)).filter(ItineraryVersion.itinerary_id == itinerary_id).scalar()
+        if latest != base_version:
+            return None
+        if latest == 0:
+            original = _load_itinerary_result(db, itinerary_id)
+            db.add(ItineraryVersion(itinerary_id=itinerary_id, version=1, instruction=None, change_note="原始版本", content=json.dumps(original, ensure_ascii=False)))
+            latest = 1
+        content = json.dumps(result, ensure_ascii=False)
+        _apply_itinerary_structure(itinerary, result)
+        if ARCHIVE_ITINERARY_JSON:
+            itinerary.content = content
+        db.add(ItineraryVersion(itinerary_id=itinerary_id, version=latest + 1, instruction=instruction, change_note=change_note, patch=patch, content=content))
+        db.commit()
+        invalidate_user_cache(itinerary.user_id)
+        return latest + 1
+    except Exception as e:
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+@_timed_query
+def get_itinerary_versions(itinerary_id: int) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        rows = db.query(ItineraryVersion.version, ItineraryVersion.instruction, ItineraryVersion.change_note, ItineraryVersion.created_at).filter(ItineraryVersion.itinerary_id == itinerary_id).order_by(ItineraryVersion.version.desc()).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
+def get_itinerary_version(itinerary_id: int, version: int) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        row = db.query(ItineraryVersion.content).filter(ItineraryVersion.itinerary_id == itinerary_id, ItineraryVersion.version == version).first()
+        return json.loads(row[0]) if row else None
+    finally:
+        db.close()
+
+
+@_timed_query
 def update_itinerary_budget(itinerary_id: int, budget_log: str) -> bool:
     db = SessionLocal()
     try:
@@ -137,6 +612,7 @@ def update_itinerary_budget(itinerary_id: int, budget_log: str) -> bool:
             else:
                 itinerary.budget_log = budget_log
             db.commit()
+            invalidate_user_cache(itinerary.user_id)
             return True
         return False
     except Exception as e:
@@ -146,22 +622,78 @@ def update_itinerary_budget(itinerary_id: int, budget_log: str) -> bool:
         db.close()
 
 
+@_timed_query
+@_cached_read
 def get_total_budget(user_id: int) -> str:
     db = SessionLocal()
     try:
-        expenses = db.query(Expense).filter(Expense.user_id == user_id).all()
-        total = sum(exp.amount for exp in expenses)
+        total = db.query(func.coalesce(func.sum(Expense.amount), 0.0)).filter(Expense.user_id == user_id).scalar()
         return f"{total:.2f}"
     finally:
         db.close()
 
 
+@_timed_query
+@_cached_read
+def get_expense_summary(user_id: int, itinerary_id: int = None) -> tuple:
+    db = SessionLocal()
+    try:
+        query = db.query(func.coalesce(func.sum(Expense.amount), 0.0), func.count(Expense.id)).filter(Expense.user_id == user_id)
+        if itinerary_id:
+            query = query.filter(Expense.itinerary_id == itinerary_id)
+        return tuple(query.one())
+    finally:
+        db.close()
+
+
+@_timed_query
+@_cached_read
+def get_expense_totals_by_itinerary(user_id: int) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        rows = db.query(Expense.itinerary_id, func.sum(Expense.amount), func.count(Expense.id)).filter(Expense.user_id == user_id).group_by(Expense.itinerary_id).order_by(Expense.itinerary_id).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
+@_cached_read
+def get_expense_totals_by_category(user_id: int, itinerary_id: int = None) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        query = db.query(Expense.item, func.sum(Expense.amount), func.count(Expense.id)).filter(Expense.user_id == user_id)
+        if itinerary_id:
+            query = query.filter(Expense.itinerary_id == itinerary_id)
+        rows = query.group_by(Expense.item).order_by(func.sum(Expense.amount).desc()).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
+@_cached_read
+def get_expense_totals_by_day(user_id: int, itinerary_id: int = None) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        day = func.date(Expense.created_at)
+        query = db.query(day, func.sum(Expense.amount), func.count(Expense.id)).filter(Expense.user_id == user_id)
+        if itinerary_id:
+            query = query.filter(Expense.itinerary_id == itinerary_id)
+        rows = query.group_by(day).order_by(day).all()
+        return [(str(row[0]), row[1], row[2]) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
 def add_expense(user_id: int, item: str, amount: float, itinerary_id: int = None) -> bool:
     db = SessionLocal()
     try:
         new_expense = Expense(user_id=user_id, item=item, amount=amount, itinerary_id=itinerary_id)
         db.add(new_expense)
         db.commit()
+        invalidate_user_cache(user_id)
         return True
     except Exception as e:
         db.rollback()
@@ -170,6 +702,8 @@ def add_expense(user_id: int, item: str, amount: float, itinerary_id: int = None
         db.close()
 
 
+@_timed_query
+@_cached_read
 def get_user_expenses(user_id: int, itinerary_id: int = None) -> List[Expense]:
     db = SessionLocal()
     try:
@@ -182,13 +716,67 @@ def get_user_expenses(user_id: int, itinerary_id: int = None) -> List[Expense]:
         db.close()
 
 
+@_timed_query
+@_cached_read
+def get_expense_rows(user_id: int, itinerary_id: int = None) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        query = db.query(Expense.id, Expense.itinerary_id, Expense.item, Expense.amount, Expense.created_at).filter(Expense.user_id == user_id)
+        if itinerary_id:
+            query = query.filter(Expense.itinerary_id == itinerary_id)
+        rows = query.order_by(Expense.created_at.desc()).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
+def update_expenses(user_id: int, changes: List[tuple]) -> bool:
+    db = SessionLocal()
+    try:
+        for start in range(0, len(changes), BULK_CHUNK_SIZE):
+            chunk = changes[start:start + BULK_CHUNK_SIZE]
+            owned = {row[0] for row in db.query(Expense.id).filter(Expense.user_id == user_id, Expense.id.in_([change[0] for change in chunk]))}
+            rows = [{"id": expense_id, "item": item, "amount": amount} for expense_id, item, amount in chunk if expense_id in owned]
+            if rows:
+                db.execute(update(Expense), rows)
+        db.commit()
+        invalidate_user_cache(user_id)
+        return True
+    except Exception as e:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+@_timed_query
+def delete_expenses(user_id: int, expense_ids: List[int]) -> bool:
+    db = SessionLocal()
+    try:
+        for start in range(0, len(expense_ids), BULK_CHUNK_SIZE):
+            chunk = expense_ids[start:start + BULK_CHUNK_SIZE]
+            db.query(Expense).filter(Expense.user_id == user_id, Expense.id.in_(chunk)).delete(synchronize_session=False)
+        db.commit()
+        invalidate_user_cache(user_id)
+        return True
+    except Exception as e:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+@_timed_query
 def delete_expense(expense_id: int) -> bool:
     db = SessionLocal()
     try:
         expense = db.query(Expense).filter(Expense.id == expense_id).first()
         if expense:
+            user_id = expense.user_id
             db.delete(expense)
             db.commit()
+            invalidate_user_cache(user_id)
             return True
         return False
     except Exception as e:
@@ -198,13 +786,17 @@ def delete_expense(expense_id: int) -> bool:
         db.close()
 
 
+@_timed_query
 def delete_itinerary(itinerary_id: int) -> bool:
     db = SessionLocal()
     try:
         itinerary = db.query(Itinerary).filter(Itinerary.id == itinerary_id).first()
         if itinerary:
+            user_id = itinerary.user_id
+            db.query(Expense).filter(Expense.itinerary_id == itinerary_id).update({Expense.itinerary_id: None}, synchronize_session=False)
             db.delete(itinerary)
             db.commit()
+            invalidate_user_cache(user_id)
             return True
         return False
     except Exception as e:
@@ -212,3 +804,286 @@ def delete_itinerary(itinerary_id: int) -> bool:
         return False
     finally:
         db.close()
+
+
+@_timed_query
+def get_llm_cache_entry(exact_key: str, normalized_key: str, ttl_seconds: int, touch_interval: int = 0) -> Optional[tuple]:
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=ttl_seconds)
+        tier = "exact"
+        entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.exact_key == exact_key, LLMCacheEntry.created_at >= cutoff).first()
+        if not entry:
+            tier = "normalized"
+            entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.normalized_key == normalized_key, LLMCacheEntry.created_at >= cutoff).order_by(LLMCacheEntry.created_at.desc()).first()
+        if not entry:
+            return None
+        response = entry.response
+        # Recency only drives LRU eviction, so a hit rewrites it at most once per touch_interval.
+        if entry.last_accessed is None or entry.last_accessed < now - timedelta(seconds=touch_interval):
+            entry.last_accessed = now
+            db.commit()
+        return response, tier
+    except Exception as e:
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+@_timed_query
+def save_llm_cache_entry(exact_key: str, normalized_key: str, response: str, ttl_seconds: int, max_entries: int) -> bool:
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.exact_key == exact_key).first()
+        if entry:
+            entry.normalized_key = normalized_key
+            entry.response = response
+            entry.created_at = now
+            entry.last_accessed = now
+        else:
+            db.add(LLMCacheEntry(exact_key=exact_key, normalized_key=normalized_key, response=response, created_at=now, last_accessed=now))
+        db.flush()
+
+        cutoff = now - timedelta(seconds=ttl_seconds)
+        db.query(LLMCacheEntry).filter(LLMCacheEntry.created_at < cutoff).delete(synchronize_session=False)
+        overflow = db.query(LLMCacheEntry).count() - max_entries
+        if overflow > 0:
+            stale_ids = [row.id for row in db.query(LLMCacheEntry.id).order_by(LLMCacheEntry.last_accessed.asc()).limit(overflow)]
+            db.query(LLMCacheEntry).filter(LLMCacheEntry.id.in_(stale_ids)).delete(synchronize_session=False)
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+
+@_timed_query
+def create_generation_job(user_id: int, prompt: str, worker_id: str = None) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        job = GenerationJob(user_id=user_id, prompt=prompt, status="queued", worker_id=worker_id, heartbeat_at=datetime.utcnow())
+        db.add(job)
+        db.commit()
+        return job.id
+    except Exception as e:
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+@_timed_query
+def create_generation_jobs(user_id: int, prompts: List[str], worker_id: str, batch_id: str) -> List[int]:
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        jobs = [GenerationJob(user_id=user_id, prompt=prompt, status="queued", worker_id=worker_id, heartbeat_at=now, batch_id=batch_id, delivered=True) for prompt in prompts]
+        db.add_all(jobs)
+        db.commit()
+        return [job.id for job in jobs]
+    except Exception as e:
+        db.rollback()
+        return []
+    finally:
+        db.close()
+
+
+@_timed_query
+def update_generation_job(job_id: int, status: str, result: str = None, error: str = None, itinerary_id: int = None) -> bool:
+    db = SessionLocal()
+    try:
+        job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+        if job:
+            job.status = status
+            job.heartbeat_at = datetime.utcnow()
+            if result is not None:
+                job.result = result
+            if error is not None:
+                job.error = error
+            if itinerary_id is not None:
+                job.itinerary_id = itinerary_id
+            db.commit()
+            return True
+        return False
+    except Exception as e:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+@_timed_query
+def mark_generation_job_delivered(job_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        updated = db.query(GenerationJob).filter(GenerationJob.id == job_id).update({GenerationJob.delivered: True}, synchronize_session=False)
+        db.commit()
+        return updated > 0
+    except Exception as e:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+@_timed_query
+def get_generation_job(job_id: int) -> Optional[GenerationJob]:
+    db = SessionLocal()
+    try:
+        return db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+    finally:
+        db.close()
+
+
+@_timed_query
+def get_pending_generation_job(user_id: int) -> Optional[GenerationJob]:
+    db = SessionLocal()
+    try:
+        job = db.query(GenerationJob).filter(GenerationJob.user_id == user_id, GenerationJob.batch_id.is_(None)).order_by(GenerationJob.id.desc()).first()
+        if job and (job.status in ACTIVE_JOB_STATUSES or not job.delivered):
+            return job
+        return None
+    finally:
+        db.close()
+
+
+@_timed_query
+def get_batch_jobs(batch_id: str) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        rows = db.query(GenerationJob.id, GenerationJob.prompt, GenerationJob.status, GenerationJob.itinerary_id, GenerationJob.error).filter(GenerationJob.batch_id == batch_id).order_by(GenerationJob.id).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+@_timed_query
+def get_latest_batch_id(user_id: int) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        row = db.query(GenerationJob.batch_id).filter(GenerationJob.user_id == user_id, GenerationJob.batch_id.isnot(None)).order_by(GenerationJob.id.desc()).first()
+        return row[0] if row else None
+    finally:
+        db.close()
+
+
+@_timed_query
+def heartbeat_generation_jobs(worker_id: str) -> int:
+    db = SessionLocal()
+    try:
+        updated = db.query(GenerationJob).filter(GenerationJob.worker_id == worker_id, GenerationJob.status.in_(ACTIVE_JOB_STATUSES)).update({GenerationJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return updated
+    except Exception as e:
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+@_timed_query
+def fail_interrupted_generation_jobs(error: str, stale_after: int = 0) -> int:
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+        last_seen = func.coalesce(GenerationJob.heartbeat_at, GenerationJob.updated_at)
+        updated = db.query(GenerationJob).filter(GenerationJob.status.in_(ACTIVE_JOB_STATUSES), last_seen < cutoff).update({GenerationJob.status: "failed", GenerationJob.error: error}, synchronize_session=False)
+        db.commit()
+        return updated
+    except Exception as e:
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+EXPORT_TABLES = (User.__table__, Itinerary.__table__, ItineraryDay.__table__, ItineraryStop.__table__, ItineraryVersion.__table__, Expense.__table__)
+
+
+def _export_filter(table, user_id: int):
+    if table is User.__table__:
+        return table.c.id == user_id
+    if "user_id" in table.c:
+        return table.c.user_id == user_id
+    return table.c.itinerary_id.in_(select(Itinerary.id).where(Itinerary.user_id == user_id))
+
+
+def iter_export_rows(user_id: int = None, batch_size: int = EXPORT_BATCH_SIZE):
+    db = SessionLocal()
+    try:
+        if engine.dialect.name == "postgresql":
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        for table in EXPORT_TABLES:
+            query = select(table).order_by(table.c.id)
+            if user_id is not None:
+                query = query.where(_export_filter(table, user_id))
+            result = db.execute(query.execution_options(yield_per=batch_size))
+            columns = list(result.keys())
+            for rows in result.partitions():
+                yield table.name, [dict(zip(columns, row)) for row in rows]
+    finally:
+        db.close()
+
+
+def _remap_import_row(table, row: dict, id_maps: dict) -> Optional[dict]:
+    row = {key: value for key, value in row.items() if key in table.c}
+    if "user_id" in table.c:
+        row["user_id"] = id_maps["users"].get(row.get("user_id"))
+        if row["user_id"] is None:
+            return None
+    if "itinerary_id" in table.c:
+        row["itinerary_id"] = id_maps["itineraries"].get(row.get("itinerary_id"))
+        if row["itinerary_id"] is None and not table.c.itinerary_id.nullable:
+            return None
+    return row
+
+
+@_timed_query
+def import_rows(batches) -> tuple:
+    tables = {table.name: table for table in EXPORT_TABLES}
+    id_maps = {"users": {}, "itineraries": {}}
+    counts = {name: 0 for name in tables}
+    skipped = 0
+    db = SessionLocal()
+    try:
+        for table_name, rows in batches:
+            table = tables.get(table_name)
+            if table is None:
+                raise ValueError(f"未知的数据表：{table_name}")
+            if table is User.__table__:
+                existing = db.execute(select(User.username).where(User.username.in_([row.get("username") for row in rows]))).scalars().all()
+                if existing:
+                    raise ValueError(f"用户名已存在：{', '.join(existing[:10])}")
+            values, old_ids = [], []
+            for row in rows:
+                remapped = _remap_import_row(table, row, id_maps)
+                if remapped is None:
+                    skipped += 1
+                    continue
+                old_ids.append(remapped.pop("id", None))
+                values.append(remapped)
+            if not values:
+                continue
+            if table.name in id_maps:
+                new_ids = db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), values).scalars().all()
+                id_maps[table.name].update(zip(old_ids, new_ids))
+            else:
+                db.execute(insert(table), values)
+            counts[table.name] += len(values)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    for user_id in id_maps["users"].values():
+        invalidate_user_cache(user_id)
+    return counts, skipped
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+EXPENSE_COLUMNS = ["id", "itinerary_id", "item", "amount", "created_at"]
+AMOUNT_TOLERANCE = 0.005
+
+
+def expense_frame(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(rows, columns=EXPENSE_COLUMNS)
+    df["itinerary_id"] = df["itinerary_id"].astype("Int64")
+    df["item"] = df["item"].fillna("").astype(str)
+    df["amount"] = df["amount"].astype(float)
+    df["created_at"] = pd.to_datetime(df["created_at"])
+    df["category"] = df["item"].str.strip()
+    df["day"] = df["created_at"].dt.normalize()
+    return df
+
+
+def totals_by(df: pd.DataFrame, column: str) -> pd.DataFrame:
+    totals = df.groupby(column, dropna=False, sort=False)["amount"].agg(total="sum", count="size")
+    return totals.sort_values("total", ascending=False) if column != "day" else totals.sort_index()
+
+
+def summarize(df: pd.DataFrame) -> dict:
+    if df.empty:
+        return {"total": 0.0, "count": 0, "daily_average": 0.0, "largest": 0.0}
+    amounts = df["amount"].to_numpy()
+    days = df["day"].nunique()
+    return {"total": float(amounts.sum()), "count": int(amounts.size), "daily_average": float(amounts.sum() / days), "largest": float(amounts.max())}
+
+
+def budget_vs_actual(df: pd.DataFrame, budgets: list) -> pd.DataFrame:
+    estimates = pd.DataFrame.from_records(budgets, columns=["itinerary_id", "summary", "estimated_budget"])
+    estimates["itinerary_id"] = estimates["itinerary_id"].astype("Int64")
+    estimates["estimated_budget"] = estimates["estimated_budget"].astype(float)
+    actual = df.dropna(subset=["itinerary_id"]).groupby("itinerary_id")["amount"].sum().rename("actual")
+    merged = estimates.merge(actual, left_on="itinerary_id", right_index=True, how="inner")
+    estimated = merged["estimated_budget"].to_numpy()
+    spent = merged["actual"].to_numpy()
+    has_estimate = np.nan_to_num(estimated) > 0
+    merged["remaining"] = np.where(has_estimate, estimated - spent, np.nan)
+    merged["usage"] = np.divide(spent, estimated, out=np.full(spent.shape, np.nan), where=has_estimate)
+    return merged.reset_index(drop=True)
+
+
+def diff_edits(original: pd.DataFrame, edited: pd.DataFrame) -> tuple:
+    deleted = edited["delete"].fillna(False).astype(bool)
+    delete_ids = edited.index[deleted].astype(int).tolist()
+    kept = edited[~deleted]
+    before = original.loc[kept.index]
+    changed = (kept["item"].fillna("").str.strip() != before["item"].str.strip()) | ~np.isclose(kept["amount"].to_numpy(dtype=float), before["amount"].to_numpy(dtype=float), atol=AMOUNT_TOLERANCE)
+    updates = kept[changed]
+    changes = list(zip(updates.index.astype(int).tolist(), updates["item"].fillna("").str.strip().tolist(), updates["amount"].astype(float).round(2).tolist()))
+    return changes, delete_ids
@@ -0,0 +1,205 @@
+import csv
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from typing import Optional
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.csv"))
+GAZETTEER_INDEX_PATH = os.getenv("GAZETTEER_INDEX_PATH", os.path.splitext(GAZETTEER_PATH)[0] + ".index.json")
+GAZETTEER_TOLERANCE_KM = float(os.getenv("GAZETTEER_TOLERANCE_KM", "2"))
+CONTEXT_TOLERANCE_KM = 50.0
+SWAP_CHECK_KM = 300.0
+ITINERARY_SPREAD_KM = 300.0
+GRID_CELL_DEG = 1.0
+INDEX_VERSION = 2
+EARTH_RADIUS_KM = 6371.0088
+
+BRACKET_PATTERN = re.compile(r"[(（\[【]([^)）\]】]*)[)）\]】]")
+
+
+def normalize_name(name: str) -> str:
+    text = unicodedata.normalize("NFKC", str(name or "")).casefold()
+    return "".join(char for char in text if unicodedata.category(char)[0] not in ("P", "S", "Z", "C"))
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, max(0.0, a))))
+
+
+def _grid_cell(lat: float, lon: float) -> tuple:
+    return int(math.floor(lat / GRID_CELL_DEG)), int(math.floor(lon / GRID_CELL_DEG))
+
+
+def build_index(source_path: str = GAZETTEER_PATH) -> dict:
+    names, lats, lons, radii, countries = [], [], [], [], []
+    keys = {}
+    with open(source_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lon = float(row["lat"]), float(row["lon"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                continue
+            place_id = len(names)
+            names.append(row["name"].strip())
+            lats.append(lat)
+            lons.append(lon)
+            radii.append(float(row.get("radius_km") or 1))
+            countries.append((row.get("country") or "").strip())
+            for alias in [row["name"]] + (row.get("aliases") or "").split("|"):
+                key = normalize_name(alias)
+                if key:
+                    keys.setdefault(key, place_id)
+
+    stat = os.stat(source_path)
+    return {
+        "version": INDEX_VERSION,
+        "source": [stat.st_size, stat.st_mtime_ns],
+        "names": names,
+        "lat": lats,
+        "lon": lons,
+        "radius_km": radii,
+        "country": countries,
+        "lookup": keys,
+    }
+
+
+def write_index(index: dict, index_path: str = GAZETTEER_INDEX_PATH):
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, index_path)
+
+
+def _load_index(source_path: str, index_path: str) -> dict:
+    stat = os.stat(source_path)
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION and index.get("source") == [stat.st_size, stat.st_mtime_ns]:
+            return index
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    index = build_index(source_path)
+    try:
+        write_index(index, index_path)
+    except OSError:
+        pass
+    return index
+
+
+class Gazetteer:
+    def __init__(self, index: dict):
+        self.names = index["names"]
+        self.lat = index["lat"]
+        self.lon = index["lon"]
+        self.radius_km = index["radius_km"]
+        self.country = index["country"]
+        self.lookup = index["lookup"]
+        self.grid = {}
+        for place_id, (lat, lon) in enumerate(zip(self.lat, self.lon)):
+            self.grid.setdefault(_grid_cell(lat, lon), []).append(place_id)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _locates(self, context_id: int, place_id: int) -> bool:
+        return haversine_km(self.lat[context_id], self.lon[context_id], self.lat[place_id], self.lon[place_id]) <= self.radius_km[context_id] + CONTEXT_TOLERANCE_KM
+
+    def resolve(self, name: str) -> Optional[int]:
+        text = unicodedata.normalize("NFKC", str(name or ""))
+        place_id = self.lookup.get(normalize_name(BRACKET_PATTERN.sub("", text)))
+        contexts = BRACKET_PATTERN.findall(text)
+        if place_id is None or not contexts:
+            return place_id
+        # Bracketed text such as 西湖（惠州） says where the place is; a match it cannot confirm is a namesake.
+        located = [self.lookup.get(normalize_name(context)) for context in contexts]
+        return place_id if any(context_id is not None and self._locates(context_id, place_id) for context_id in located) else None
+
+    def nearest(self, lat: float, lon: float, max_km: float) -> Optional[tuple]:
+        lat_cells = int(math.ceil(max_km / 111.0 / GRID_CELL_DEG))
+        lon_cells = int(math.ceil(max_km / (111.0 * max(math.cos(math.radians(min(abs(lat) + lat_cells * GRID_CELL_DEG, 89.0))), 0.01)) / GRID_CELL_DEG))
+        cell_lat, cell_lon = _grid_cell(lat, lon)
+        best = None
+        for d_lat in range(-lat_cells, lat_cells + 1):
+            for d_lon in range(-lon_cells, lon_cells + 1):
+                for place_id in self.grid.get((cell_lat + d_lat, cell_lon + d_lon), ()):
+                    distance = haversine_km(lat, lon, self.lat[place_id], self.lon[place_id])
+                    if distance <= max_km and (best is None or distance < best[1]):
+                        best = (place_id, distance)
+        return best
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                try:
+                    _gazetteer = Gazetteer(_load_index(GAZETTEER_PATH, GAZETTEER_INDEX_PATH))
+                except OSError:
+                    _gazetteer = Gazetteer({"names": [], "lat": [], "lon": [], "radius_km": [], "country": [], "lookup": {}})
+    return _gazetteer
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _looks_swapped(gazetteer: Gazetteer, lat: float, lon: float, valid: bool) -> bool:
+    if abs(lon) > 90 or abs(lat) > 180:
+        return False
+    if valid and gazetteer.nearest(lat, lon, SWAP_CHECK_KM) is not None:
+        return False
+    return gazetteer.nearest(lon, lat, SWAP_CHECK_KM) is not None
+
+
+def _on_place(gazetteer: Gazetteer, place_id: int, lat: float, lon: float) -> bool:
+    return haversine_km(lat, lon, gazetteer.lat[place_id], gazetteer.lon[place_id]) <= gazetteer.radius_km[place_id] + GAZETTEER_TOLERANCE_KM
+
+
+def _near_itinerary(gazetteer: Gazetteer, place_id: int, anchors: list, index: int) -> bool:
+    for anchor_index, lat, lon in anchors:
+        if anchor_index != index and haversine_km(lat, lon, gazetteer.lat[place_id], gazetteer.lon[place_id]) <= gazetteer.radius_km[place_id] + ITINERARY_SPREAD_KM:
+            return True
+    return False
+
+
+def correct_coordinates(points: list) -> list:
+    gazetteer = get_gazetteer()
+    rows = []
+    for point in points or []:
+        if not isinstance(point, dict):
+            continue
+        point = dict(point)
+        lat, lon = _to_float(point.get("lat")), _to_float(point.get("lon"))
+        valid = lat is not None and lon is not None and abs(lat) <= 90 and abs(lon) <= 180 and not (lat == 0 and lon == 0)
+        place_id = gazetteer.resolve(point.get("name", ""))
+        if not (valid and place_id is not None) and lat is not None and lon is not None and _looks_swapped(gazetteer, lat, lon, valid):
+            lat, lon, valid = lon, lat, True
+            point["lat"], point["lon"] = lat, lon
+        rows.append((point, lat, lon, valid, place_id))
+
+    # Only a confirmed exact match near another stop of the trip may move or fill a point; otherwise coordinates stay as given.
+    anchors = [(index, lat, lon) for index, (_, lat, lon, valid, _) in enumerate(rows) if valid]
+    for index, (point, lat, lon, valid, place_id) in enumerate(rows):
+        if place_id is None or (valid and _on_place(gazetteer, place_id, lat, lon)):
+            continue
+        if _near_itinerary(gazetteer, place_id, anchors, index):
+            point["lat"], point["lon"] = gazetteer.lat[place_id], gazetteer.lon[place_id]
+    return [row[0] for row in rows]
@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+DUPLICATE_PRECISION = 4
+CLUSTER_RADIUS_KM = float(os.getenv("CLUSTER_RADIUS_KM", "1.0"))
+MAP_CLUSTER_THRESHOLD = int(os.getenv("MAP_CLUSTER_THRESHOLD", "50"))
+TWO_OPT_MAX_ROUNDS = 50
+
+
+def clean_coordinates(points: list) -> pd.DataFrame:
+    df = pd.DataFrame([point for point in points or [] if isinstance(point, dict)], columns=["name", "lat", "lon", "day"])
+    df["name"] = df["name"].fillna("").astype(str).str.strip()
+    df["lat"] = pd.to_numeric(df["lat"], errors="coerce")
+    df["lon"] = pd.to_numeric(df["lon"], errors="coerce")
+    df["day"] = pd.to_numeric(df["day"], errors="coerce").astype("Int64")
+    valid = df["lat"].between(-90, 90) & df["lon"].between(-180, 180) & ~((df["lat"] == 0) & (df["lon"] == 0))
+    df = df[valid]
+    df = df[~(df["name"].ne("") & df.duplicated(subset=["name", "day"]))]
+    rounded = df[["lat", "lon"]].round(DUPLICATE_PRECISION)
+    df = df[~rounded.duplicated()]
+    return df.reset_index(drop=True)
+
+
+def haversine_matrix(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def cluster_stops(distances: np.ndarray, radius_km: float = CLUSTER_RADIUS_KM) -> np.ndarray:
+    labels = np.full(len(distances), -1, dtype=int)
+    cluster = 0
+    for i in range(len(distances)):
+        if labels[i] != -1:
+            continue
+        members = (labels == -1) & (distances[i] <= radius_km)
+        labels[members] = cluster
+        cluster += 1
+    return labels
+
+
+def _nearest_neighbour_route(distances: np.ndarray) -> np.ndarray:
+    n = len(distances)
+    route = [0]
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    for _ in range(n - 1):
+        candidates = np.where(visited, np.inf, distances[route[-1]])
+        nearest = int(np.argmin(candidates))
+        route.append(nearest)
+        visited[nearest] = True
+    return np.array(route)
+
+
+def _two_opt(route: np.ndarray, distances: np.ndarray) -> np.ndarray:
+    n = len(route)
+    if n < 4:
+        return route
+    for _ in range(TWO_OPT_MAX_ROUNDS):
+        improved = False
+        for i in range(n - 2):
+            a, b = route[i], route[i + 1]
+            c = route[i + 2:]
+            d = np.append(route[i + 3:], -1)
+            next_edges = np.where(d >= 0, distances[c, np.maximum(d, 0)], 0.0)
+            new_edges = np.where(d >= 0, distances[b, np.maximum(d, 0)], 0.0)
+            delta = distances[a, c] + new_edges - distances[a, b] - next_edges
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                j = i + 2 + best
+                route[i + 1:j + 1] = route[i + 1:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return route
+
+
+def order_route(distances: np.ndarray) -> np.ndarray:
+    if len(distances) == 0:
+        return np.array([], dtype=int)
+    return _two_opt(_nearest_neighbour_route(distances), distances)
+
+
+def plan_route(points: list) -> tuple:
+    df = clean_coordinates(points)
+    if df.empty:
+        return df.assign(order=pd.Series(dtype=int), cluster=pd.Series(dtype=int), leg_km=pd.Series(dtype=float)), pd.DataFrame(columns=["day", "stops", "distance_km"])
+
+    df["cluster"] = cluster_stops(haversine_matrix(df["lat"].to_numpy(), df["lon"].to_numpy()))
+    ordered = []
+    for _, group in df.groupby(df["day"].fillna(0), sort=True):
+        group = group.reset_index(drop=True)
+        distances = haversine_matrix(group["lat"].to_numpy(), group["lon"].to_numpy())
+        route = order_route(distances)
+        group = group.iloc[route].reset_index(drop=True)
+        legs = distances[route[:-1], route[1:]] if len(route) > 1 else np.array([])
+        group["leg_km"] = np.concatenate([[0.0], legs])
+        ordered.append(group)
+
+    route_df = pd.concat(ordered, ignore_index=True)
+    route_df["order"] = np.arange(1, len(route_df) + 1)
+    day_distances = route_df.groupby(route_df["day"].fillna(0), sort=True).agg(stops=("name", "size"), distance_km=("leg_km", "sum")).reset_index()
+    return route_df, day_distances
+
+
+def map_points(route_df: pd.DataFrame) -> pd.DataFrame:
+    if len(route_df) <= MAP_CLUSTER_THRESHOLD:
+        return route_df[["name", "lat", "lon"]].assign(size=200)
+    clusters = route_df.groupby("cluster").agg(name=("name", "first"), lat=("lat", "mean"), lon=("lon", "mean"), count=("name", "size"))
+    return clusters.assign(size=200 * np.sqrt(clusters["count"])).reset_index(drop=True)
@@ -0,0 +1,99 @@
+import json
+
+
+def strip_code_fence(content: str) -> str:
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    if content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    return content.strip()
+
+
+def _decode_partial_string(raw: str) -> str:
+    for cut in range(0, 7):
+        candidate = raw[:len(raw) - cut] if cut else raw
+        try:
+            return json.loads(f"\"{candidate}\"", strict=False)
+        except ValueError:
+            continue
+    return ""
+
+
+class ItineraryStreamParser:
+    def __init__(self):
+        self.buffer = ""
+        self.coordinates = []
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._pending_key = None
+        self._current_key = None
+        self._text_start = None
+        self._text_end = None
+        self._object_start = None
+
+    def feed(self, chunk: str) -> int:
+        self.buffer += chunk
+        found = len(self.coordinates)
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._text_start == self._string_start + 1 and self._text_end is None:
+                            self._text_end = i
+                        elif self._current_key is None:
+                            self._pending_key = _decode_partial_string(buffer[self._string_start + 1:i])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+                if self._depth == 1 and self._current_key == "itinerary_text" and self._text_start is None:
+                    self._text_start = i + 1
+            elif char in "{[":
+                self._depth += 1
+                if char == "{" and self._depth == 3 and self._current_key == "coordinates":
+                    self._object_start = i
+            elif char in "}]":
+                if char == "}" and self._depth == 3 and self._object_start is not None:
+                    self._add_coordinate(buffer[self._object_start:i + 1])
+                    self._object_start = None
+                self._depth -= 1
+            elif self._depth == 1:
+                if char == ":":
+                    self._current_key = self._pending_key
+                    self._pending_key = None
+                elif char == ",":
+                    self._current_key = None
+        self._pos = len(buffer)
+        return len(self.coordinates) - found
+
+    def _add_coordinate(self, raw: str):
+        try:
+            point = json.loads(raw)
+        except ValueError:
+            return
+        if isinstance(point, dict) and (point.get("name") or isinstance(point.get("lat"), (int, float)) and isinstance(point.get("lon"), (int, float))):
+            self.coordinates.append(point)
+
+    @property
+    def text(self) -> str:
+        if self._text_start is None:
+            return ""
+        end = self._text_end if self._text_end is not None else len(self.buffer)
+        return _decode_partial_string(self.buffer[self._text_start:end])
+
+    def result(self) -> dict:
+        return json.loads(strip_code_fence(self.buffer), strict=False)
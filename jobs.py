@@ -0,0 +1,85 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from database import save_itinerary, create_generation_job, create_generation_jobs, update_generation_job, heartbeat_generation_jobs, fail_interrupted_generation_jobs
+from resilience import LLM_MAX_CONCURRENCY
+
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "60"))
+INTERRUPTED_JOB_ERROR = "服务重启，生成任务已中断，请重新提交"
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_executor = None
+_executor_lock = threading.Lock()
+_progress = {}
+_progress_lock = threading.Lock()
+
+
+def start_job_workers() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            fail_interrupted_generation_jobs(INTERRUPTED_JOB_ERROR, JOB_STALE_AFTER)
+            _executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="itinerary-worker")
+            threading.Thread(target=_heartbeat_forever, name="itinerary-heartbeat", daemon=True).start()
+        return _executor
+
+
+def _heartbeat_forever():
+    while True:
+        time.sleep(JOB_HEARTBEAT_INTERVAL)
+        heartbeat_generation_jobs(WORKER_ID)
+        fail_interrupted_generation_jobs(INTERRUPTED_JOB_ERROR, JOB_STALE_AFTER)
+
+
+def submit_generation_job(user_id: int, prompt: str, api_key: str, base_url: str = None) -> Optional[int]:
+    executor = start_job_workers()
+    job_id = create_generation_job(user_id, prompt, WORKER_ID)
+    if job_id:
+        executor.submit(_run_generation_job, job_id, user_id, prompt, api_key, base_url)
+    return job_id
+
+
+def submit_generation_batch(user_id: int, prompts: list, api_key: str, base_url: str = None) -> Optional[str]:
+    start_job_workers()
+    batch_id = uuid.uuid4().hex
+    job_ids = create_generation_jobs(user_id, prompts, WORKER_ID, batch_id)
+    if not job_ids:
+        return None
+    from batch import generate_batch
+    threading.Thread(target=generate_batch, args=(user_id, prompts, api_key, base_url), kwargs={"job_ids": job_ids}, name=f"itinerary-batch-{batch_id[:8]}", daemon=True).start()
+    return batch_id
+
+
+def get_job_progress(job_id: int) -> Optional[tuple]:
+    with _progress_lock:
+        return _progress.get(job_id)
+
+
+def _set_job_progress(job_id: int, itinerary_text: str, coordinates: list):
+    with _progress_lock:
+        _progress[job_id] = (itinerary_text, list(coordinates))
+
+
+def _run_generation_job(job_id: int, user_id: int, prompt: str, api_key: str, base_url: str = None):
+    from llm import call_llm, summarize_itinerary
+    update_generation_job(job_id, "running")
+    try:
+        result = call_llm(prompt, api_key, base_url, on_update=lambda text, coordinates: _set_job_progress(job_id, text, coordinates))
+        itinerary_id = None
+        if result.get("coordinates"):
+            content_json = json.dumps(result, ensure_ascii=False)
+            itinerary_id = save_itinerary(user_id, content_json, summary=summarize_itinerary(result.get("itinerary_text", "")))
+        update_generation_job(job_id, "succeeded", result=json.dumps(result, ensure_ascii=False), itinerary_id=itinerary_id)
+    except Exception as e:
+        update_generation_job(job_id, "failed", error=str(e))
+    finally:
+        with _progress_lock:
+            _progress.pop(job_id, None)
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import openai
+
+from llm_cache import get_cached_result, cache_result
+from itinerary_stream import ItineraryStreamParser, strip_code_fence
+from clients import get_openai_client
+from gazetteer import correct_coordinates
+from metrics import LLM_REQUEST_SECONDS, LLM_REFINE_SECONDS, LLM_FIRST_TOKEN_SECONDS, LLM_ERRORS, LLM_TOKENS
+from resilience import DeadlineExceeded, RATE_LIMITED, UNAVAILABLE, call_with_resilience, call_with_resilience_async, get_rate_limiter, get_circuit_breaker, get_llm_limiter
+
+LLM_MODEL = "qwen-plus"
+
+SYSTEM_PROMPT = """你是一个专业的旅行规划助手。请根据用户的需求生成旅行计划。
+必须返回纯 JSON 格式，不要包含任何其他文字。
+JSON 格式如下：
+{
+    "itinerary_text": "详细的旅行计划文本，包括每天的行程安排、交通方式、住宿建议等，以及详细的费用预算分析",
+    "estimated_budget": 预计总花费（数字，单位元）,
+    "days": [
+        {"day": 第几天（数字）, "title": "当天行程主题", "estimated_cost": 当天预计花费（数字，单位元）}
+    ],
+    "coordinates": [
+        {"name": "地点名称", "lat": 纬度, "lon": 经度, "day": 所属第几天（数字）, "estimated_cost": 该地点预计花费（数字，单位元）}
+    ]
+}
+days 数组按天列出行程概要。coordinates 数组包含行程中主要地点的经纬度坐标，用于在地图上展示。"""
+
+REFINE_SYSTEM_PROMPT = """你是一个专业的旅行规划助手。用户会提供已有的旅行计划（JSON）和修改要求，请只返回需要修改的部分。
+必须返回纯 JSON 格式，不要包含任何其他文字，不要重复没有变化的内容。
+JSON 格式如下：
+{
+    "change_note": "本次修改的简要说明",
+    "estimated_budget": 修改后的预计总花费（数字，单位元，没有变化时省略）,
+    "text_edits": [
+        {"find": "itinerary_text 中需要修改的原文片段，必须与原文逐字一致，尽量简短但唯一", "replace": "替换后的内容"}
+    ],
+    "days": [
+        {"day": 新增或有变化的第几天（数字）, "title": "当天行程主题", "estimated_cost": 当天预计花费（数字，单位元）, "coordinates": [
+            {"name": "地点名称", "lat": 纬度, "lon": 经度, "estimated_cost": 该地点预计花费（数字，单位元）}
+        ]},
+        {"day": 需要删除的第几天（数字）, "remove": true}
+    ]
+}
+text_edits 中 find 为空字符串表示把 replace 追加到行程文本末尾。days 只列出新增、修改或删除的天；某天提供 coordinates 时替换该天的全部地点，不提供时保留原有地点。"""
+
+STREAM_RENDER_INTERVAL = 0.2
+SUMMARY_LENGTH = 40
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "180"))
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "true").lower() in ("1", "true", "yes")
+
+
+def _classify_openai_error(error: Exception):
+    if isinstance(error, openai.RateLimitError):
+        return RATE_LIMITED
+    if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+        return UNAVAILABLE
+    if isinstance(error, openai.APIStatusError) and (error.status_code in (408, 409) or error.status_code >= 500):
+        return UNAVAILABLE
+    return None
+
+
+def _record_usage(usage):
+    if usage is None:
+        return
+    LLM_TOKENS.inc("prompt", amount=usage.prompt_tokens or 0)
+    LLM_TOKENS.inc("completion", amount=usage.completion_tokens or 0)
+
+
+def _request_kwargs(prompt: str, remaining: float) -> dict:
+    return dict(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        stream=True,
+        timeout=remaining,
+        **({"stream_options": {"include_usage": True}} if LLM_STREAM_USAGE else {})
+    )
+
+
+def _feed_chunk(chunk, parser: ItineraryStreamParser, request_started: float, on_update, last_render: float) -> float:
+    _record_usage(getattr(chunk, "usage", None))
+    if not chunk.choices or not chunk.choices[0].delta.content:
+        return last_render
+    if not parser.buffer:
+        LLM_FIRST_TOKEN_SECONDS.observe(time.monotonic() - request_started)
+    new_points = parser.feed(chunk.choices[0].delta.content)
+    if on_update and (new_points or time.monotonic() - last_render >= STREAM_RENDER_INTERVAL):
+        on_update(parser.text, correct_coordinates(parser.coordinates))
+        return time.monotonic()
+    return last_render
+
+
+def _parsed_result(parser: ItineraryStreamParser):
+    result = parser.result()
+    if isinstance(result, dict):
+        result["coordinates"] = correct_coordinates(result.get("coordinates"))
+    return result
+
+
+def _resilience_for(api_key: str, base_url: str = None) -> tuple:
+    return get_rate_limiter(hashlib.sha256(api_key.encode("utf-8")).hexdigest()), get_circuit_breaker(f"llm:{base_url or 'default'}")
+
+
+def call_llm(prompt: str, api_key: str, base_url: str = None, on_update=None, background: bool = False) -> dict:
+    started = time.perf_counter()
+    cache_namespace = f"{LLM_MODEL}\n{SYSTEM_PROMPT}"
+    cached = get_cached_result(prompt, cache_namespace)
+    if cached is not None:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, "cache_hit")
+        return cached
+
+    client = get_openai_client(api_key, base_url)
+    limiter, breaker = _resilience_for(api_key, base_url)
+
+    def generate(remaining: float) -> dict:
+        deadline_at = time.monotonic() + remaining
+        request_started = time.monotonic()
+        response = client.chat.completions.create(**_request_kwargs(prompt, remaining))
+
+        parser = ItineraryStreamParser()
+        last_render = 0.0
+        for chunk in response:
+            if time.monotonic() > deadline_at:
+                response.close()
+                raise DeadlineExceeded("行程生成超时，请稍后重试")
+            last_render = _feed_chunk(chunk, parser, request_started, on_update, last_render)
+        return _parsed_result(parser)
+
+    try:
+        with get_llm_limiter().slot(background):
+            result = call_with_resilience(generate, LLM_DEADLINE, limiter, breaker, _classify_openai_error)
+    except Exception as e:
+        LLM_ERRORS.inc(type(e).__name__)
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, "error")
+        raise
+    LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, "success")
+    cache_result(prompt, result, cache_namespace)
+    return result
+
+
+async def call_llm_async(prompt: str, client: openai.AsyncOpenAI, api_key: str, base_url: str = None, on_update=None, background: bool = False) -> dict:
+    started = time.perf_counter()
+    cache_namespace = f"{LLM_MODEL}\n{SYSTEM_PROMPT}"
+    cached = await asyncio.to_thread(get_cached_result, prompt, cache_namespace)
+    if cached is not None:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, "cache_hit")
+        return cached
+
+    limiter, breaker = _resilience_for(api_key, base_url)
+
+    async def generate(remaining: float) -> dict:
+        deadline_at = time.monotonic() + remaining
+        request_started = time.monotonic()
+        response = await client.chat.completions.create(**_request_kwargs(prompt, remaining))
+
+        parser = ItineraryStreamParser()
+        last_render = 0.0
+        async for chunk in response:
+            if time.monotonic() > deadline_at:
+                await response.close()
+                raise DeadlineExceeded("行程生成超时，请稍后重试")
+            last_render = _feed_chunk(chunk, parser, request_started, on_update, last_render)
+        return _parsed_result(parser)
+
+    try:
+        async with get_llm_limiter().slot_async(background):
+            result = await call_with_resilience_async(generate, LLM_DEADLINE, limiter, breaker, _classify_openai_error)
+    except Exception as e:
+        LLM_ERRORS.inc(type(e).__name__)
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, "error")
+        raise
+    LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, "success")
+    await asyncio.to_thread(cache_result, prompt, result, cache_namespace)
+    return result
+
+
+def call_llm_patch(itinerary: dict, instruction: str, api_key: str, base_url: str = None) -> dict:
+    started = time.perf_counter()
+    client = get_openai_client(api_key, base_url)
+    limiter, breaker = _resilience_for(api_key, base_url)
+    messages = [
+        {"role": "system", "content": REFINE_SYSTEM_PROMPT},
+        {"role": "user", "content": f"已有旅行计划：\n{json.dumps(itinerary, ensure_ascii=False)}\n\n修改要求：{instruction}"}
+    ]
+
+    def generate(remaining: float) -> dict:
+        response = client.chat.completions.create(model=LLM_MODEL, messages=messages, temperature=0.3, timeout=remaining)
+        _record_usage(response.usage)
+        return json.loads(strip_code_fence(response.choices[0].message.content or ""), strict=False)
+
+    try:
+        with get_llm_limiter().slot():
+            patch = call_with_resilience(generate, LLM_DEADLINE, limiter, breaker, _classify_openai_error)
+    except Exception as e:
+        LLM_ERRORS.inc(type(e).__name__)
+        LLM_REFINE_SECONDS.observe(time.perf_counter() - started, "error")
+        raise
+    LLM_REFINE_SECONDS.observe(time.perf_counter() - started, "success")
+    return patch
+
+
+def summarize_itinerary(itinerary_text: str) -> str:
+    for line in itinerary_text.splitlines():
+        line = line.strip().lstrip("#>*- ").replace("**", "").strip()
+        if line:
+            return line[:SUMMARY_LENGTH]
+    return ""
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Optional
+
+from amounts import format_number, replace_chinese_numbers, scale_numbers, ungroup_numbers
+from database import get_llm_cache_entry, save_llm_cache_entry
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_TOUCH_INTERVAL = int(os.getenv("LLM_CACHE_TOUCH_INTERVAL", "300"))
+NUMBER_SEPARATOR = "|"
+
+DECIMAL_NUMBER_PATTERN = re.compile(r"\d+\.\d+")
+CURRENCY_SUFFIX_PATTERN = re.compile(r"(?<=\d)\s*(元|块钱|块|rmb|人民币)")
+RANGE_MARKER_PATTERN = re.compile(r"(?<=\d)\s*(?:-|~|—|–|至|到)+\s*(?=\d)")
+NUMBER_GAP_PATTERN = re.compile(r"(?<=\d)(\.|[^\w.]+)(?=\d)")
+
+_stats = {"exact_hits": 0, "normalized_hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _strip_punctuation(text: str) -> str:
+    return "".join(char for char in text if unicodedata.category(char)[0] not in ("P", "S", "Z", "C"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    text = replace_chinese_numbers(text)
+    text = ungroup_numbers(text)
+    text = scale_numbers(text)
+    text = DECIMAL_NUMBER_PATTERN.sub(lambda m: format_number(float(m.group())), text)
+    text = CURRENCY_SUFFIX_PATTERN.sub("", text)
+    text = RANGE_MARKER_PATTERN.sub("至", text)
+    # Separate figures keep a boundary, so 8000，2人 and 80002人 do not share a key.
+    pieces = NUMBER_GAP_PATTERN.split(text)
+    return "".join(_strip_punctuation(piece) if i % 2 == 0 else (piece if piece == "." else NUMBER_SEPARATOR) for i, piece in enumerate(pieces))
+
+
+def _hash(namespace: str, text: str) -> str:
+    return hashlib.sha256(f"{namespace}\n{text}".encode("utf-8")).hexdigest()
+
+
+def get_cached_result(prompt: str, namespace: str = "") -> Optional[dict]:
+    cached = get_llm_cache_entry(_hash(namespace, prompt), _hash(namespace, normalize_prompt(prompt)), LLM_CACHE_TTL, LLM_CACHE_TOUCH_INTERVAL)
+    with _stats_lock:
+        if cached is None:
+            _stats["misses"] += 1
+            return None
+        _stats[f"{cached[1]}_hits"] += 1
+    return json.loads(cached[0])
+
+
+def cache_result(prompt: str, result: dict, namespace: str = "") -> bool:
+    return save_llm_cache_entry(
+        _hash(namespace, prompt),
+        _hash(namespace, normalize_prompt(prompt)),
+        json.dumps(result, ensure_ascii=False),
+        LLM_CACHE_TTL,
+        LLM_CACHE_MAX_ENTRIES,
+    )
+
+
+def get_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["hits"] = stats["exact_hits"] + stats["normalized_hits"]
+    return stats
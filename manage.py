@@ -0,0 +1,155 @@
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import init_db, backfill_itinerary_structure, get_user_by_username, EXPORT_BATCH_SIZE
+from batch import BATCH_MAX_CONCURRENCY, BatchInputError, read_batch_csv, generate_batch
+from gazetteer import GAZETTEER_PATH, GAZETTEER_INDEX_PATH, build_index, write_index
+from transfer import EXPORT_FORMATS, describe_counts, export_data, guess_format, import_data
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "2500"))
+RERUN_BUDGET_MS = float(os.getenv("RERUN_BUDGET_MS", "50"))
+
+
+def backfill_itineraries(args):
+    init_db()
+    count = backfill_itinerary_structure(args.batch_size)
+    print(f"已回填 {count} 条行程")
+
+
+def build_gazetteer(args):
+    index = build_index(args.source)
+    write_index(index, args.output)
+    print(f"已索引 {len(index['names'])} 个地点（{len(index['lookup'])} 个名称），写入 {args.output}")
+
+
+def generate_batch_itineraries(args):
+    init_db()
+    user = get_user_by_username(args.username)
+    if user is None:
+        sys.exit(f"用户 {args.username} 不存在")
+    api_key = args.api_key or os.getenv("API_KEY", "")
+    if not api_key:
+        sys.exit("请通过 --api-key 或环境变量 API_KEY 提供 API Key")
+    with open(args.csv, "rb") as f:
+        try:
+            prompts = read_batch_csv(f.read())
+        except BatchInputError as e:
+            sys.exit(str(e))
+
+    def report_progress(finished, total, outcome):
+        status = f"行程 #{outcome['itinerary_id']}" if outcome["itinerary_id"] else (outcome["error"] or "未保存")
+        print(f"[{finished}/{total}] {outcome['prompt']} -> {status}")
+
+    started = time.perf_counter()
+    results = generate_batch(user.id, prompts, api_key, args.base_url or os.getenv("API_BASE_URL", ""), args.concurrency, on_progress=report_progress)
+    succeeded = sum(1 for outcome in results if outcome["status"] == "succeeded")
+    print(f"完成 {succeeded}/{len(results)} 个行程，用时 {time.perf_counter() - started:.1f} 秒")
+
+
+def profile_app_startup(args):
+    from benchmarks import report
+    from benchmarks.bench_startup import profile_startup
+
+    try:
+        profile = profile_startup(args.reruns, args.database_url)
+    except RuntimeError as e:
+        sys.exit(f"启动分析失败: {e}")
+    results = report.summarize(profile["samples"])
+    report.print_results(results)
+    print()
+    print(f"登录页已加载的重型依赖：{', '.join(profile['modules']['login_page']) or '无'}")
+    print(f"登录后已加载的重型依赖：{', '.join(profile['modules']['logged_in']) or '无'}")
+
+    cold_start, rerun = results["startup.cold_start"]["max_ms"], results["startup.rerun"]["p95_ms"]
+    exceeded = []
+    if cold_start > args.startup_budget_ms:
+        exceeded.append(f"冷启动 {cold_start:.0f} ms 超过预算 {args.startup_budget_ms:.0f} ms")
+    if rerun > args.rerun_budget_ms:
+        exceeded.append(f"登录后重跑 p95 {rerun:.1f} ms 超过预算 {args.rerun_budget_ms:.0f} ms")
+    for message in exceeded:
+        print(message)
+    if exceeded:
+        sys.exit(1)
+    print(f"冷启动 {cold_start:.0f} ms / {args.startup_budget_ms:.0f} ms，登录后重跑 p95 {rerun:.1f} ms / {args.rerun_budget_ms:.0f} ms，均在预算内")
+
+
+def export_user_data(args):
+    init_db()
+    user_id = None
+    if args.username:
+        user = get_user_by_username(args.username)
+        if user is None:
+            sys.exit(f"用户 {args.username} 不存在")
+        user_id = user.id
+    started = time.perf_counter()
+    try:
+        counts = export_data(args.output, args.format or guess_format(args.output), user_id)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"已导出 {describe_counts(counts)} 到 {args.output}，用时 {time.perf_counter() - started:.1f} 秒")
+
+
+def import_user_data(args):
+    init_db()
+    started = time.perf_counter()
+    try:
+        counts, skipped = import_data(args.input, args.format or guess_format(args.input), args.batch_size)
+    except ValueError as e:
+        sys.exit(f"导入失败，未写入任何数据: {e}")
+    print(f"已导入 {describe_counts(counts)}，用时 {time.perf_counter() - started:.1f} 秒")
+    if skipped:
+        print(f"跳过 {skipped} 条关联对象不在导出文件中的记录")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="旅行规划助手管理命令")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = subparsers.add_parser("backfill-itineraries", help="将已有行程的 JSON 内容拆分写入结构化表")
+    backfill_parser.add_argument("--batch-size", type=int, default=100)
+    backfill_parser.set_defaults(func=backfill_itineraries)
+
+    gazetteer_parser = subparsers.add_parser("build-gazetteer", help="根据地名数据集生成本地地理编码索引")
+    gazetteer_parser.add_argument("--source", default=GAZETTEER_PATH)
+    gazetteer_parser.add_argument("--output", default=GAZETTEER_INDEX_PATH)
+    gazetteer_parser.set_defaults(func=build_gazetteer)
+
+    batch_parser = subparsers.add_parser("generate-batch", help="根据 CSV 并发批量生成行程并保存到指定用户")
+    batch_parser.add_argument("--username", required=True)
+    batch_parser.add_argument("--csv", required=True)
+    batch_parser.add_argument("--api-key")
+    batch_parser.add_argument("--base-url")
+    batch_parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY)
+    batch_parser.set_defaults(func=generate_batch_itineraries)
+
+    startup_parser = subparsers.add_parser("profile-startup", help="在新进程中测量应用冷启动和页面重跑耗时，并与预算比较")
+    startup_parser.add_argument("--reruns", type=int, default=10)
+    startup_parser.add_argument("--database-url", help="默认使用临时 SQLite 数据库，不会写入正式数据")
+    startup_parser.add_argument("--startup-budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    startup_parser.add_argument("--rerun-budget-ms", type=float, default=RERUN_BUDGET_MS)
+    startup_parser.set_defaults(func=profile_app_startup)
+
+    export_parser = subparsers.add_parser("export", help="流式导出用户数据（JSON Lines 或 Parquet），用于备份和迁移")
+    export_parser.add_argument("--output", required=True, help="以 .jsonl / .jsonl.gz 结尾时导出为 JSON Lines，否则导出为 Parquet 目录")
+    export_parser.add_argument("--username", help="只导出该用户的数据，默认导出全部用户")
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS)
+    export_parser.set_defaults(func=export_user_data)
+
+    import_parser = subparsers.add_parser("import", help="将导出的数据导入当前数据库，自动分配新的记录 ID")
+    import_parser.add_argument("--input", required=True)
+    import_parser.add_argument("--format", choices=EXPORT_FORMATS)
+    import_parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    import_parser.set_defaults(func=import_user_data)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import cProfile
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.getenv("METRICS_PORT") or "0")
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH", "")
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "60"))
+PROFILE_RERUNS = os.getenv("PROFILE_RERUNS", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list((extra or {}).items())]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.values = {}
+        self.lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        with self.lock:
+            values = dict(self.values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.values = {}
+        self.lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def observe(self, value: float, *label_values):
+        with self.lock:
+            state = self.values.get(label_values)
+            if state is None:
+                state = self.values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self) -> list:
+        with self.lock:
+            values = {key: ([*state[0]], state[1], state[2]) for key, state in self.values.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.label_names, label_values, {"le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, label_values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, label_values)} {count}")
+        return lines
+
+
+DB_QUERY_SECONDS = Histogram("travel_db_query_seconds", "Time spent in database.py functions", ("function",))
+DB_QUERY_ERRORS = Counter("travel_db_query_errors_total", "Exceptions raised by database.py functions", ("function",))
+LLM_REQUEST_SECONDS = Histogram("travel_llm_request_seconds", "Itinerary generation latency including retries", ("outcome",))
+LLM_REFINE_SECONDS = Histogram("travel_llm_refine_seconds", "Itinerary refinement (patch) latency including retries", ("outcome",))
+LLM_FIRST_TOKEN_SECONDS = Histogram("travel_llm_first_token_seconds", "Time from sending the LLM request to the first streamed token")
+LLM_ERRORS = Counter("travel_llm_errors_total", "Failed itinerary generations by exception type", ("error",))
+LLM_TOKENS = Counter("travel_llm_tokens_total", "Tokens reported in the LLM response usage", ("type",))
+ASR_REQUEST_SECONDS = Histogram("travel_asr_request_seconds", "Speech recognition latency including retries", ("outcome",))
+ASR_ERRORS = Counter("travel_asr_errors_total", "Failed speech recognitions by reason", ("reason",))
+AUDIO_TRANSCODE_SECONDS = Histogram("travel_audio_transcode_seconds", "Time spent converting recordings to the ASR format")
+RERUN_SECONDS = Histogram("travel_rerun_seconds", "Streamlit script rerun duration")
+BOOTSTRAP_SECONDS = Histogram("travel_bootstrap_seconds", "Once-per-process schema creation and worker startup")
+
+
+def timed(histogram: Histogram, errors: Counter = None):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(func.__name__)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, func.__name__)
+
+        return wrapper
+
+    return decorator
+
+
+def render_metrics() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        data = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _dump_metrics_forever(path: str, interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(render_metrics())
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_metrics_exporters():
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        if METRICS_PORT:
+            try:
+                server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), _MetricsHandler)
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+            except OSError as e:
+                print(f"指标端口 {METRICS_PORT} 启动失败: {e}")
+        if METRICS_DUMP_PATH:
+            threading.Thread(target=_dump_metrics_forever, args=(METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL), name="metrics-dump", daemon=True).start()
+
+
+@contextmanager
+def timed_rerun():
+    profiler = None
+    if PROFILE_RERUNS:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    started = time.perf_counter()
+    # st.rerun() and st.stop() end the script with a BaseException, so timing runs in finally.
+    try:
+        yield
+    finally:
+        RERUN_SECONDS.observe(time.perf_counter() - started)
+        if profiler is not None:
+            profiler.disable()
+            try:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                profiler.dump_stats(os.path.join(PROFILE_DIR, f"rerun-{datetime.now():%Y%m%d-%H%M%S-%f}.prof"))
+            except OSError:
+                pass
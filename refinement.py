@@ -0,0 +1,109 @@
+import json
+from typing import Optional
+
+from database import get_itinerary_result, get_itinerary_version, get_latest_itinerary_version, save_itinerary_revision
+from gazetteer import correct_coordinates
+from llm import call_llm_patch
+
+
+class RefinementError(Exception):
+    pass
+
+
+def _day_number(value) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _copy_result(itinerary: dict) -> dict:
+    return {
+        "itinerary_text": itinerary.get("itinerary_text") or "",
+        "estimated_budget": itinerary.get("estimated_budget"),
+        "days": [dict(day) for day in itinerary.get("days") or [] if isinstance(day, dict)],
+        "coordinates": [dict(point) for point in itinerary.get("coordinates") or [] if isinstance(point, dict)],
+    }
+
+
+def _apply_text_edits(text: str, edits: list) -> tuple:
+    unapplied = []
+    for edit in edits:
+        if not isinstance(edit, dict):
+            continue
+        find, replace = str(edit.get("find") or ""), str(edit.get("replace") or "")
+        if not find:
+            text = f"{text.rstrip()}\n\n{replace}" if text else replace
+        elif find in text:
+            text = text.replace(find, replace, 1)
+        else:
+            unapplied.append(find)
+    return text, unapplied
+
+
+def _replace_day_points(coordinates: list, day: int, points: list) -> list:
+    positions = [i for i, point in enumerate(coordinates) if _day_number(point.get("day")) == day]
+    kept = [point for point in coordinates if _day_number(point.get("day")) != day]
+    if not positions:
+        following = next((i for i, point in enumerate(kept) if (_day_number(point.get("day")) or 0) > day), len(kept))
+        return kept[:following] + points + kept[following:]
+    insert_at = positions[0]
+    return kept[:insert_at] + points + kept[insert_at:]
+
+
+def apply_itinerary_patch(itinerary: dict, patch: dict) -> tuple:
+    if not isinstance(patch, dict):
+        raise RefinementError("模型返回的修改内容格式不正确")
+    result = _copy_result(itinerary)
+
+    if isinstance(patch.get("itinerary_text"), str) and patch["itinerary_text"].strip():
+        result["itinerary_text"] = patch["itinerary_text"]
+    result["itinerary_text"], unapplied = _apply_text_edits(result["itinerary_text"], patch.get("text_edits") or [])
+    if patch.get("estimated_budget") is not None:
+        result["estimated_budget"] = patch["estimated_budget"]
+    if isinstance(patch.get("coordinates"), list):
+        result["coordinates"] = correct_coordinates([dict(point) for point in patch["coordinates"] if isinstance(point, dict)])
+
+    days = {_day_number(day.get("day")): day for day in result["days"]}
+    for day_patch in patch.get("days") or []:
+        number = _day_number(day_patch.get("day")) if isinstance(day_patch, dict) else None
+        if number is None:
+            continue
+        if day_patch.get("remove"):
+            days.pop(number, None)
+            result["coordinates"] = [point for point in result["coordinates"] if _day_number(point.get("day")) != number]
+            continue
+        day = days.setdefault(number, {"day": number})
+        for key in ("title", "estimated_cost"):
+            if key in day_patch:
+                day[key] = day_patch[key]
+        if isinstance(day_patch.get("coordinates"), list):
+            points = correct_coordinates([dict(point, day=number) for point in day_patch["coordinates"] if isinstance(point, dict)])
+            result["coordinates"] = _replace_day_points(result["coordinates"], number, points)
+    result["days"] = [days[number] for number in sorted(number for number in days if number is not None)]
+    return result, unapplied
+
+
+def refine_itinerary(itinerary_id: int, instruction: str, api_key: str, base_url: str = None) -> tuple:
+    base_version = get_latest_itinerary_version(itinerary_id)
+    current = get_itinerary_result(itinerary_id)
+    if current is None:
+        raise RefinementError("行程不存在")
+    patch = call_llm_patch(current, instruction, api_key, base_url)
+    revised, unapplied = apply_itinerary_patch(current, patch)
+    version = save_itinerary_revision(itinerary_id, revised, instruction, json.dumps(patch, ensure_ascii=False), str(patch.get("change_note") or ""), base_version)
+    if version is None:
+        raise RefinementError("行程已被修改或保存失败，请刷新后重试")
+    return version, unapplied
+
+
+def restore_itinerary_version(itinerary_id: int, version: int) -> int:
+    snapshot = get_itinerary_version(itinerary_id, version)
+    if snapshot is None:
+        raise RefinementError(f"版本 {version} 不存在")
+    note = f"恢复到版本 {version}"
+    restored = save_itinerary_revision(itinerary_id, snapshot, note, None, note, get_latest_itinerary_version(itinerary_id))
+    if restored is None:
+        raise RefinementError("行程已被修改或保存失败，请刷新后重试")
+    return restored
+
@@ -0,0 +1,287 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_INTERACTIVE_RESERVE = int(os.getenv("LLM_INTERACTIVE_RESERVE", "1"))
+
+RATE_LIMITED = "rate_limited"
+UNAVAILABLE = "unavailable"
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class TransientError(Exception):
+    def __init__(self, message: str, kind: str = UNAVAILABLE):
+        super().__init__(message)
+        self.kind = kind
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.max_rate = rate_per_second
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def _try_acquire(self) -> float:
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    def penalize(self):
+        with self.lock:
+            self._refill()
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def reward(self):
+        with self.lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.probing:
+                raise CircuitOpenError("服务暂时不可用，请稍后再试")
+            self.probing = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self):
+        with self.lock:
+            self.probing = False
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int, reserved: int = 0):
+        self.slots = threading.BoundedSemaphore(limit)
+        # Background work never holds more than limit - reserved slots, so interactive calls always find one free.
+        self.background_slots = threading.BoundedSemaphore(max(1, limit - reserved))
+        self.waiters = ThreadPoolExecutor(max_workers=limit, thread_name_prefix="llm-slot-waiter")
+
+    def _acquire(self, background: bool):
+        if background:
+            self.background_slots.acquire()
+        self.slots.acquire()
+
+    def _release(self, background: bool):
+        self.slots.release()
+        if background:
+            self.background_slots.release()
+
+    @contextmanager
+    def slot(self, background: bool = False):
+        self._acquire(background)
+        try:
+            yield
+        finally:
+            self._release(background)
+
+    @asynccontextmanager
+    async def slot_async(self, background: bool = False):
+        waiting = asyncio.get_running_loop().run_in_executor(self.waiters, self._acquire, background)
+        try:
+            await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            # The waiter thread still gets the slot eventually; hand it straight back.
+            def give_back(future):
+                if not future.cancelled() and future.exception() is None:
+                    self._release(background)
+
+            waiting.add_done_callback(give_back)
+            raise
+        try:
+            yield
+        finally:
+            self._release(background)
+
+
+_rate_limiters = {}
+_circuit_breakers = {}
+_llm_limiter = None
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiter(key: str) -> TokenBucket:
+    with _registry_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = TokenBucket(RATE_LIMIT_PER_MINUTE / 60, RATE_LIMIT_BURST)
+            _rate_limiters[key] = limiter
+        return limiter
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _circuit_breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+            _circuit_breakers[name] = breaker
+        return breaker
+
+
+def get_llm_limiter() -> ConcurrencyLimiter:
+    global _llm_limiter
+    with _registry_lock:
+        if _llm_limiter is None:
+            _llm_limiter = ConcurrencyLimiter(LLM_MAX_CONCURRENCY, LLM_INTERACTIVE_RESERVE)
+        return _llm_limiter
+
+
+def _backoff_delay(attempt: int) -> float:
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def _is_retryable(error: Exception, limiter: TokenBucket, breaker: CircuitBreaker, classify) -> bool:
+    kind = error.kind if isinstance(error, TransientError) else (classify(error) if classify else None)
+    if kind == RATE_LIMITED:
+        limiter.penalize()
+        breaker.release()
+    elif kind == UNAVAILABLE:
+        breaker.record_failure()
+    else:
+        breaker.release()
+        return False
+    return True
+
+
+def call_with_resilience(func, deadline: float, limiter: TokenBucket, breaker: CircuitBreaker, classify=None, max_attempts: int = RETRY_MAX_ATTEMPTS):
+    deadline_at = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        attempt += 1
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("请求超时，请稍后重试")
+        breaker.before_call()
+        if not limiter.acquire(timeout=remaining):
+            breaker.release()
+            raise DeadlineExceeded("请求过于频繁，请稍后重试")
+
+        try:
+            result = func(deadline_at - time.monotonic())
+        except Exception as e:
+            if not _is_retryable(e, limiter, breaker, classify):
+                raise
+            delay = _backoff_delay(attempt)
+            if attempt >= max_attempts or time.monotonic() + delay >= deadline_at:
+                raise
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        limiter.reward()
+        return result
+
+
+async def call_with_resilience_async(func, deadline: float, limiter: TokenBucket, breaker: CircuitBreaker, classify=None, max_attempts: int = RETRY_MAX_ATTEMPTS):
+    deadline_at = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        attempt += 1
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("请求超时，请稍后重试")
+        breaker.before_call()
+        if not await limiter.acquire_async(timeout=remaining):
+            breaker.release()
+            raise DeadlineExceeded("请求过于频繁，请稍后重试")
+
+        try:
+            result = await func(deadline_at - time.monotonic())
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            if not _is_retryable(e, limiter, breaker, classify):
+                raise
+            delay = _backoff_delay(attempt)
+            if attempt >= max_attempts or time.monotonic() + delay >= deadline_at:
+                raise
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        limiter.reward()
+        return result
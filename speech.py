@@ -0,0 +1,70 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_processing import ASR_SAMPLE_RATE, prepare_asr_chunks
+from clients import get_speech_client
+from metrics import ASR_REQUEST_SECONDS, ASR_ERRORS, AUDIO_TRANSCODE_SECONDS
+from resilience import RATE_LIMITED, UNAVAILABLE, TransientError, call_with_resilience, get_rate_limiter, get_circuit_breaker
+
+ASR_DEADLINE = float(os.getenv("ASR_DEADLINE", "30"))
+ASR_CHUNK_CONCURRENCY = int(os.getenv("ASR_CHUNK_CONCURRENCY", "4"))
+ASR_RATE_LIMIT_ERRORS = (3304, 3305)
+ASR_UNAVAILABLE_ERRORS = (3303, 3307)
+ASR_NO_SPEECH_ERROR = 3301
+
+
+class SpeechRecognitionError(Exception):
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def _recognize_chunk(client, chunk, deadline_at: float, limiter, breaker) -> str:
+    def recognize(remaining):
+        response = client.asr(chunk.raw_data, 'pcm', ASR_SAMPLE_RATE, {
+            'dev_pid': 1537,
+            'cuid': 'travel_planning_user',
+        })
+        if response.get('err_no') in ASR_RATE_LIMIT_ERRORS:
+            raise TransientError(response.get('err_msg', ''), RATE_LIMITED)
+        if response.get('err_no') in ASR_UNAVAILABLE_ERRORS or response.get('error_code') == 'SDK108':
+            raise TransientError(response.get('err_msg') or response.get('error_msg', ''), UNAVAILABLE)
+        return response
+
+    result = call_with_resilience(recognize, max(0.0, deadline_at - time.monotonic()), limiter, breaker)
+    if result.get('err_no') == 0:
+        return "".join(result.get('result') or [])
+    if result.get('err_no') == ASR_NO_SPEECH_ERROR:
+        return ""
+    raise SpeechRecognitionError(f"语音识别失败: {result.get('err_msg') or result.get('error_msg', '')}", str(result.get('err_no') or result.get('error_code', 'unknown')))
+
+
+def recognize_speech(audio, app_id: str, api_key: str, secret_key: str) -> str:
+    try:
+        with AUDIO_TRANSCODE_SECONDS.time():
+            chunks = prepare_asr_chunks(audio)
+    except Exception as e:
+        ASR_ERRORS.inc(type(e).__name__)
+        raise
+    if not chunks:
+        ASR_ERRORS.inc("silence")
+        raise SpeechRecognitionError("未检测到声音，请重新录制", "silence")
+
+    client = get_speech_client(app_id, api_key, secret_key)
+    limiter = get_rate_limiter(f"baidu:{app_id}")
+    breaker = get_circuit_breaker("baidu_asr")
+    started = time.perf_counter()
+    deadline_at = time.monotonic() + ASR_DEADLINE
+    try:
+        if len(chunks) == 1:
+            texts = [_recognize_chunk(client, chunks[0], deadline_at, limiter, breaker)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(ASR_CHUNK_CONCURRENCY, len(chunks)), thread_name_prefix="asr-chunk") as executor:
+                texts = list(executor.map(lambda chunk: _recognize_chunk(client, chunk, deadline_at, limiter, breaker), chunks))
+    except Exception as e:
+        ASR_REQUEST_SECONDS.observe(time.perf_counter() - started, "error")
+        ASR_ERRORS.inc(e.reason if isinstance(e, SpeechRecognitionError) else type(e).__name__)
+        raise
+    ASR_REQUEST_SECONDS.observe(time.perf_counter() - started, "success")
+    return "".join(texts)
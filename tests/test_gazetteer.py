@@ -0,0 +1,45 @@
+import json
+
+from gazetteer import GAZETTEER_PATH, Gazetteer, _load_index, build_index, correct_coordinates
+
+
+def _coordinates(points):
+    return [(point["name"], point.get("lat"), point.get("lon")) for point in correct_coordinates(points)]
+
+
+def test_unconfirmed_bracket_context_leaves_missing_coordinates_empty():
+    assert _coordinates([{"name": "西湖（惠州）", "lat": None, "lon": None}, {"name": "罗浮山", "lat": 23.27, "lon": 114.05}])[0] == ("西湖（惠州）", None, None)
+
+
+def test_lone_substring_match_leaves_missing_coordinates_empty():
+    assert _coordinates([{"name": "北京路步行街", "lat": None, "lon": None}]) == [("北京路步行街", None, None)]
+
+
+def test_namesakes_keep_valid_coordinates():
+    assert _coordinates([{"name": "北京路步行街", "lat": 23.125, "lon": 113.269}]) == [("北京路步行街", 23.125, 113.269)]
+    assert _coordinates([{"name": "西湖（惠州）", "lat": 23.10, "lon": 114.39}]) == [("西湖（惠州）", 23.10, 114.39)]
+    assert _coordinates([{"name": "上海路", "lat": 32.05, "lon": 118.77}, {"name": "南京", "lat": 32.06, "lon": 118.79}])[0] == ("上海路", 32.05, 118.77)
+    assert _coordinates([{"name": "西湖", "lat": 23.10, "lon": 114.39}, {"name": "罗浮山", "lat": 23.27, "lon": 114.05}])[0] == ("西湖", 23.10, 114.39)
+
+
+def test_single_point_itinerary_is_not_filled():
+    assert _coordinates([{"name": "天安门", "lat": None, "lon": None}]) == [("天安门", None, None)]
+
+
+def test_confirmed_exact_match_fills_and_corrects_within_trip():
+    trip = [{"name": "天安门", "lat": 31.2, "lon": 121.4}, {"name": "故宫", "lat": 39.916, "lon": 116.397}, {"name": "颐和园（北京）", "lat": None, "lon": None}]
+    corrected = _coordinates(trip)
+    assert corrected[0] == ("天安门", 39.9055, 116.3976)
+    assert corrected[2][1:] != (None, None)
+
+
+def test_swapped_coordinates_are_restored():
+    assert _coordinates([{"name": "某地", "lat": 116.0, "lon": 39.0}]) == [("某地", 39.0, 116.0)]
+
+
+def test_index_is_stored_as_json(tmp_path):
+    index_path = tmp_path / "gazetteer.index.json"
+    index = _load_index(GAZETTEER_PATH, str(index_path))
+    with open(index_path, encoding="utf-8") as f:
+        assert json.load(f) == index
+    assert len(Gazetteer(index)) == len(build_index(GAZETTEER_PATH)["names"])
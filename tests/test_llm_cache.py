@@ -0,0 +1,55 @@
+import pytest
+
+from amounts import chinese_to_int, parse_amount
+from database import LLMCacheEntry, SessionLocal, init_db
+from llm_cache import cache_result, get_cached_result, normalize_prompt
+
+
+@pytest.mark.parametrize("first, second", [
+    ("去日本5天，预算1万3，2人", "去日本5天，预算1万，32人"),
+    ("预算8000，2人", "预算80002人"),
+    ("北京5-7天", "北京57天"),
+    ("预算1.5", "预算15"),
+])
+def test_separate_numbers_do_not_collide(first, second):
+    assert normalize_prompt(first) != normalize_prompt(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("去日本5天，预算1万3，2人", "去日本5天 预算13000 2人"),
+    ("预算1万3千", "预算13000元"),
+    ("预算一万五千元", "预算1.5万"),
+    ("预算8,000，2人", "预算8000，2人"),
+    ("北京5~7天", "北京五到七天"),
+])
+def test_equivalent_prompts_share_key(first, second):
+    assert normalize_prompt(first) == normalize_prompt(second)
+
+
+@pytest.mark.parametrize("text, value", [("一千五", 1500), ("两万五", 25000), ("一千零五", 1005), ("十五", 15), ("一万二千五", 12500)])
+def test_chinese_to_int(text, value):
+    assert chinese_to_int(text) == value
+
+
+@pytest.mark.parametrize("text, value", [
+    ("1万3", 13000), ("2千5", 2500), ("1万3000", 13000), ("1.5万", 15000), ("约1500元", 1500),
+    ("1,200.50元", 1200.5), ("5,000-8,000", None), ("3000元（2人）", None), ("免费", None),
+])
+def test_parse_amount(text, value):
+    assert parse_amount(text) == value
+
+
+def test_cache_hit_touches_last_accessed_once_per_interval(monkeypatch):
+    import llm_cache
+
+    init_db()
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_TOUCH_INTERVAL", 3600)
+    assert cache_result("去杭州3天，预算3000", {"itinerary_text": "杭州"})
+    db = SessionLocal()
+    stored = db.query(LLMCacheEntry).one().last_accessed
+    db.close()
+
+    assert get_cached_result("去杭州3天 预算3000元") == {"itinerary_text": "杭州"}
+    db = SessionLocal()
+    assert db.query(LLMCacheEntry).one().last_accessed == stored
+    db.close()
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+from resilience import ConcurrencyLimiter
+
+
+def test_background_work_leaves_reserved_slots_for_interactive_calls():
+    limiter = ConcurrencyLimiter(2, reserved=1)
+    with limiter.slot(background=True):
+        assert not limiter.background_slots.acquire(blocking=False)
+        acquired = threading.Event()
+
+        def interactive():
+            with limiter.slot():
+                acquired.set()
+
+        thread = threading.Thread(target=interactive)
+        thread.start()
+        assert acquired.wait(1)
+        thread.join()
+
+
+def test_async_slots_never_exceed_limit_and_survive_cancellation():
+    limiter = ConcurrencyLimiter(3, reserved=1)
+    running = {"now": 0, "peak": 0}
+
+    async def work():
+        async with limiter.slot_async(background=True):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            try:
+                await asyncio.sleep(0.02)
+            finally:
+                running["now"] -= 1
+
+    async def main():
+        blocker = asyncio.ensure_future(work())
+        waiting = [asyncio.ensure_future(work()) for _ in range(3)]
+        await asyncio.sleep(0.005)
+        waiting[0].cancel()
+        await asyncio.gather(blocker, *waiting, return_exceptions=True)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert running["peak"] == 2
+    assert limiter.slots.acquire(blocking=False) and limiter.slots.acquire(blocking=False) and limiter.slots.acquire(blocking=False)
@@ -0,0 +1,173 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, Float, Integer
+
+from database import EXPORT_BATCH_SIZE, EXPORT_TABLES, import_rows, iter_export_rows
+
+EXPORT_FORMAT = "travel-planning-export"
+EXPORT_FORMAT_VERSION = 1
+EXPORT_FORMATS = ("jsonl", "parquet")
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+MANIFEST_NAME = "manifest.json"
+TABLE_LABELS = {
+    "users": "用户",
+    "itineraries": "行程",
+    "itinerary_days": "行程日程",
+    "itinerary_stops": "行程地点",
+    "itinerary_versions": "行程版本",
+    "expenses": "费用记录",
+}
+
+
+class TransferError(ValueError):
+    pass
+
+
+def guess_format(path: str) -> str:
+    name = os.path.basename(path.rstrip("/\\")).lower()
+    return "jsonl" if name.endswith((".jsonl", ".jsonl.gz", ".ndjson", ".ndjson.gz")) else "parquet"
+
+
+def describe_counts(counts: dict) -> str:
+    return "、".join(f"{TABLE_LABELS.get(name, name)} {count}" for name, count in counts.items())
+
+
+def _manifest(user_id: int = None, counts: dict = None) -> dict:
+    manifest = {"format": EXPORT_FORMAT, "version": EXPORT_FORMAT_VERSION, "created_at": datetime.utcnow().isoformat(timespec="seconds"), "user_id": user_id}
+    if counts is not None:
+        manifest["tables"] = counts
+    return manifest
+
+
+def _check_manifest(manifest: dict):
+    if manifest.get("format") != EXPORT_FORMAT:
+        raise TransferError("不是旅行规划助手的导出文件")
+    if manifest.get("version", 0) > EXPORT_FORMAT_VERSION:
+        raise TransferError(f"导出文件格式版本 {manifest.get('version')} 高于当前支持的版本 {EXPORT_FORMAT_VERSION}，请先升级应用")
+
+
+def _open_text(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=EXPORT_GZIP_LEVEL)
+    return open(path, mode, encoding="utf-8")
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def _decode_row(table, row: dict) -> dict:
+    for column in table.columns:
+        if isinstance(column.type, DateTime) and isinstance(row.get(column.name), str):
+            row[column.name] = datetime.fromisoformat(row[column.name])
+    return row
+
+
+def _arrow_schema(table):
+    import pyarrow as pa
+
+    def arrow_type(column):
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        return pa.string()
+
+    return pa.schema([pa.field(column.name, arrow_type(column)) for column in table.columns])
+
+
+def export_jsonl(path: str, user_id: int = None) -> dict:
+    counts = {table.name: 0 for table in EXPORT_TABLES}
+    with _open_text(path, "w") as f:
+        f.write(json.dumps(_manifest(user_id)) + "\n")
+        for table_name, rows in iter_export_rows(user_id):
+            f.writelines(json.dumps({"table": table_name, "row": row}, ensure_ascii=False, separators=(",", ":"), default=_json_value) + "\n" for row in rows)
+            counts[table_name] += len(rows)
+    return counts
+
+
+def export_parquet(directory: str, user_id: int = None) -> dict:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+    schemas = {table.name: _arrow_schema(table) for table in EXPORT_TABLES}
+    counts = {name: 0 for name in schemas}
+    writers = {name: pq.ParquetWriter(os.path.join(directory, f"{name}.parquet"), schema, compression=PARQUET_COMPRESSION) for name, schema in schemas.items()}
+    try:
+        for table_name, rows in iter_export_rows(user_id):
+            writers[table_name].write_batch(pa.RecordBatch.from_pylist(rows, schema=schemas[table_name]))
+            counts[table_name] += len(rows)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(_manifest(user_id, counts), f, ensure_ascii=False, indent=2)
+    return counts
+
+
+def _read_jsonl(path: str, batch_size: int):
+    tables = {table.name: table for table in EXPORT_TABLES}
+    with _open_text(path, "r") as f:
+        try:
+            _check_manifest(json.loads(f.readline() or "{}"))
+        except json.JSONDecodeError:
+            raise TransferError("不是旅行规划助手的导出文件")
+        current, batch = None, []
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            table_name = record.get("table")
+            if batch and (table_name != current or len(batch) >= batch_size):
+                yield current, batch
+                batch = []
+            current = table_name
+            table = tables.get(table_name)
+            batch.append(_decode_row(table, record["row"]) if table is not None else record["row"])
+        if batch:
+            yield current, batch
+
+
+def _read_parquet(directory: str, batch_size: int):
+    import pyarrow.parquet as pq
+
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise TransferError(f"目录中缺少 {MANIFEST_NAME}，不是旅行规划助手的导出目录")
+    with open(manifest_path, encoding="utf-8") as f:
+        _check_manifest(json.load(f))
+    for table in EXPORT_TABLES:
+        path = os.path.join(directory, f"{table.name}.parquet")
+        if not os.path.exists(path):
+            continue
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield table.name, batch.to_pylist()
+
+
+def export_data(path: str, export_format: str, user_id: int = None) -> dict:
+    if export_format == "jsonl":
+        return export_jsonl(path, user_id)
+    if export_format == "parquet":
+        return export_parquet(path, user_id)
+    raise TransferError(f"不支持的导出格式：{export_format}")
+
+
+def import_data(path: str, export_format: str, batch_size: int = EXPORT_BATCH_SIZE) -> tuple:
+    if not os.path.exists(path):
+        raise TransferError(f"找不到导入文件：{path}")
+    if export_format == "jsonl":
+        return import_rows(_read_jsonl(path, batch_size))
+    if export_format == "parquet":
+        return import_rows(_read_parquet(path, batch_size))
+    raise TransferError(f"不支持的导入格式：{export_format}")